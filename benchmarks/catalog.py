@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Benchmark of how the block metadata generation and the extension build scale with the size of the block catalog.
+
+Generates synthetic extensions, modelled on the blocks in samples/blocks, with a number of blocks each having a number
+of parameters with enumerated values, of inputs and outputs, and message files for a number of locales. For each
+catalog size, 'build metadata' and 'build extension' are run and their throughput (blocks per second) and peak
+memory use are reported.
+
+The commands are first run on a catalog of a single block, to measure their fixed cost such as starting Python, which
+is subtracted from the time taken for the other sizes to get the time per block. The scaling exponent between
+consecutive sizes (1.0 for linear scaling) is computed from these times, and the benchmark fails if the exponent
+between the smallest and the largest size exceeds a maximum, which does not depend on the machine.
+
+The time per block is also divided by the time of a fixed Python workload run on the same machine, giving a relative
+cost which can be compared between runs on different machines. The results are compared with the baseline committed
+in baselines/ for the parser used, failing if the relative cost or the memory use per block of the largest size has
+regressed by more than the tolerance, and can be saved with --save to update it. A baseline saved on the machine it is
+compared on can be compared with a smaller tolerance.
+"""
+import argparse, json, math, os, re, subprocess, sys, tempfile, time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYTICS_BUILDER = os.path.join(BENCHMARKS_DIR, '..', 'analytics_builder')
+LOCALES = ['DE', 'PL', 'PT_BR', 'ZH_CN', 'ZH_TW', 'NL', 'FR', 'JA_JP', 'KO', 'ES']
+PACKAGE = 'apamax.analyticsbuilder.benchmark'
+CALIBRATION_RUNS = 5
+# The committed baselines, for the built-in parser and for ApamaDoc
+BASELINES = {True: os.path.join(BENCHMARKS_DIR, 'baselines', 'catalog-builtinParser.json'), False: os.path.join(BENCHMARKS_DIR, 'baselines', 'catalog-apamadoc.json')}
+
+BLOCK_TEMPLATE = '''/*
+ * Synthetic block generated by benchmarks/catalog.py
+ */
+
+package {package};
+
+using apama.analyticsbuilder.BlockBase;
+using apama.analyticsbuilder.Activation;
+
+/**
+ * Parameters for {name} block.
+ */
+event {name}_$Parameters {{
+{parameters}
+}}
+
+/**
+ * {name}.
+ *
+ * Synthetic block number {index} of the benchmark catalog.
+ *
+ * Passes its inputs through to its outputs.
+ *
+ * @$blockCategory Calculations
+ */
+event {name} {{
+
+	/**BlockBase object.
+	 *
+	 * This is initialized by the framework when the block is required for a model.
+	 */
+	BlockBase $base;
+
+	/** Block parameters, filled in by the framework. */
+	{name}_$Parameters $parameters;
+
+	/**
+	 * This action receives the input values and contains the logic of the block.
+	 *
+	 * @param $activation The current activation.
+{inputDocs}
+	 */
+	action $process(Activation $activation{inputParams}) {{
+{body}
+	}}
+{outputs}
+}}
+'''
+
+PARAMETER_TEMPLATE = '''	/**
+	 * Mode {i}.
+	 *
+	 * The mode {i} of the block.
+	 */
+	string mode{i};
+{constants}'''
+
+OUTPUT_TEMPLATE = '''
+	/**
+	 * Output {i}.
+	 *
+	 * The value of input {i}.
+	 */
+	action<Activation, float> $setOutput_out{i};
+'''
+
+def generate_block(index, params, enums, io):
+	"""
+	:return: Tuple of the name and the EPL source of a synthetic block.
+	"""
+	name = f'Block{index:05d}'
+	parameters = '\n'.join(PARAMETER_TEMPLATE.format(i=p, constants=''.join(
+		f'\t/** Option {e} */\n\tconstant string mode{p}_option{e} := "option{e}";\n' for e in range(enums))) for p in range(params))
+	return (name, BLOCK_TEMPLATE.format(package=PACKAGE, name=name, index=index, parameters=parameters,
+		inputDocs='\n'.join(f'\t * @param $input_in{i} Input {i}.\n\t * @$inputName in{i} Input {i}' for i in range(io)),
+		inputParams=''.join(f', float $input_in{i}' for i in range(io)),
+		body='\n'.join(f'\t\t$setOutput_out{i}($activation, $input_in{i});' for i in range(io)),
+		outputs=''.join(OUTPUT_TEMPLATE.format(i=i) for i in range(io))))
+
+def generate_catalog(directory, blocks, params, enums, io, locales):
+	"""
+	Generate a synthetic extension.
+	:param directory: The directory to generate it in.
+	:param blocks: The number of blocks.
+	:param params: The number of parameters of each block.
+	:param enums: The number of enumerated values of each parameter.
+	:param io: The number of inputs and of outputs of each block.
+	:param locales: The number of locales with a messages file, in addition to the default one.
+	:return: The total size of the block files in bytes.
+	"""
+	size = 0
+	messages = {}
+	for b in range(blocks):
+		(name, epl) = generate_block(b, params, enums, io)
+		with open(os.path.join(directory, name + '.mon'), 'w', encoding='utf8') as f:
+			size += f.write(epl)
+		messages[f'benchmark_{PACKAGE}.{name}_invalidValue'] = f"Invalid value for '{{{{0}}}}' of {name}"
+	with open(os.path.join(directory, 'benchmark-messages.json'), 'w', encoding='utf8') as f:
+		json.dump(messages, f, indent=1)
+	for locale in LOCALES[:locales]:
+		os.makedirs(os.path.join(directory, locale))
+		with open(os.path.join(directory, locale, 'benchmark-messages.json'), 'w', encoding='utf8') as f:
+			json.dump({k: f'[{locale}] {v}' for (k, v) in messages.items()}, f, indent=1)
+	return size
+
+def run_command(args, env):
+	"""
+	Run an analytics_builder command.
+	:return: Tuple of the wall-clock time in seconds and the peak resident set size of the command and its tools in megabytes.
+	"""
+	start = time.perf_counter()
+	process = subprocess.Popen([sys.executable, ANALYTICS_BUILDER] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+	stderr = process.stderr.read()
+	(_, status, rusage) = os.wait4(process.pid, 0)
+	process.returncode = os.waitstatus_to_exitcode(status)
+	seconds = time.perf_counter() - start
+	if process.returncode != 0:
+		raise Exception(f'analytics_builder {" ".join(args)} failed: {stderr.decode(errors="replace")}')
+	return (seconds, rusage.ru_maxrss / 1024)
+
+def calibrate():
+	"""
+	:return: The time in seconds of a fixed Python workload, similar to the parsing and the JSON processing of the
+	commands, the fastest of a few runs. The times per block are divided by it to compare them between machines.
+	"""
+	(_, epl) = generate_block(0, 8, 8, 4)
+	def workload():
+		start = time.perf_counter()
+		for _ in range(200):
+			json.loads(json.dumps(re.findall(r'/\*\*.*?\*/|\w+|\S', epl, re.DOTALL)))
+		return time.perf_counter() - start
+	return min(workload() for _ in range(CALIBRATION_RUNS))
+
+def run_benchmark(args):
+	"""
+	:return: The results, as stored in a baseline.
+	"""
+	config = {'params': args.params, 'enums': args.enums, 'io': args.io, 'locales': args.locales, 'builtinParser': args.builtinParser}
+	calibrationSecs = calibrate()
+	results = {'config': config, 'calibrationSecs': round(calibrationSecs, 5), 'fixed': {}, 'metadata': {}, 'extension': {}}
+	# Do not hand the builds over to a build server the user may be running
+	env = dict(os.environ, ANALYTICS_BUILDER_SOCKET=os.path.join(tempfile.gettempdir(), f'analytics_builder-benchmark-{os.getpid()}.sock'))
+	options = ['--builtinParser'] if args.builtinParser else []
+	fixed = {}
+	# The single block catalog measures the fixed cost of the commands
+	for blocks in [1] + args.sizes:
+		with tempfile.TemporaryDirectory(prefix='analytics_builder_benchmark_') as tmp:
+			catalog = os.path.join(tmp, 'catalog')
+			os.makedirs(catalog)
+			eplBytes = generate_catalog(catalog, blocks, args.params, args.enums, args.io, args.locales)
+			commands = {
+				'metadata': ['build', 'metadata', '--input', catalog, '--output', os.path.join(tmp, 'metadata.json')] + options,
+				'extension': ['build', 'extension', '--input', catalog, '--output', os.path.join(tmp, 'extension.zip')] + options,
+			}
+			for (kind, command) in commands.items():
+				runs = [run_command(command, env) for _ in range(args.runs)]
+				(seconds, peakRssMB) = (min(r[0] for r in runs), max(r[1] for r in runs))
+				if blocks == 1:
+					fixed[kind] = (seconds, peakRssMB)
+					results['fixed'][kind] = {'seconds': round(seconds, 4), 'peakRssMB': round(peakRssMB, 1)}
+					print(f'{kind:<10} fixed cost     {seconds:8.3f}s  {peakRssMB:28.1f} MB', flush=True)
+					continue
+				perBlockSecs = max(seconds - fixed[kind][0], 0) / (blocks - 1)
+				results[kind][str(blocks)] = {'seconds': round(seconds, 4), 'blocksPerSec': round(blocks / seconds, 2),
+					'perBlockMs': round(perBlockSecs * 1000, 4), 'relativeCost': round(perBlockSecs / calibrationSecs, 4),
+					'eplBytes': eplBytes, 'peakRssMB': round(peakRssMB, 1),
+					'perBlockKB': round(max(peakRssMB - fixed[kind][1], 0) * 1024 / (blocks - 1), 2)}
+				print(f'{kind:<10} {blocks:>6} blocks  {seconds:8.3f}s  {blocks / seconds:9.1f} blocks/s  {perBlockSecs * 1000:7.3f} ms/block  {peakRssMB:7.1f} MB', flush=True)
+	results['scaling'] = {kind: scaling(results[kind], fixed[kind][0]) for kind in commands}
+	return results
+
+def scaling(sizes, fixedSecs):
+	"""
+	:return: Dictionary of 'N1-N2' to the exponent k of the time taken, less the fixed cost, growing as N^k between
+	consecutive sizes, and between the smallest and the largest size as 'overall'.
+	"""
+	points = sorted((int(n), max(r['seconds'] - fixedSecs, 1e-6)) for (n, r) in sizes.items())
+	exponent = lambda n1, t1, n2, t2: round(math.log(t2 / t1) / math.log(n2 / n1), 3)
+	exponents = {f'{n1}-{n2}': exponent(n1, t1, n2, t2) for ((n1, t1), (n2, t2)) in zip(points, points[1:])}
+	exponents['overall'] = exponent(*points[0], *points[-1])
+	return exponents
+
+def compare(results, baseline, tolerance):
+	"""
+	Compare the results of the largest size which the baseline has too, where the fixed cost weighs the least on the
+	cost per block.
+	:return: List of the regressions compared to the baseline.
+	"""
+	failures = []
+	for kind in ('metadata', 'extension'):
+		common = [blocks for blocks in results[kind] if blocks in baseline.get(kind, {})]
+		if not common: continue
+		blocks = max(common, key=int)
+		(r, b) = (results[kind][blocks], baseline[kind][blocks])
+		if r['relativeCost'] > b['relativeCost'] * (1 + tolerance):
+			failures.append(f'{kind} of {blocks} blocks: relative cost per block {r["relativeCost"]}, baseline {b["relativeCost"]}')
+		if r['perBlockKB'] > b['perBlockKB'] * (1 + tolerance):
+			failures.append(f'{kind} of {blocks} blocks: memory per block {r["perBlockKB"]} KB, baseline {b["perBlockKB"]} KB')
+	return failures
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the block metadata generation and the extension build on synthetic block catalogs of increasing size.')
+	parser.add_argument('--sizes', metavar='N,...', type=lambda s: [int(n) for n in s.split(',')], default=[200, 800, 3200], help='the numbers of blocks of the catalogs, large enough for the time per block to outweigh the fixed cost of the commands (default 200,800,3200)')
+	parser.add_argument('--params', metavar='M', type=int, default=4, help='the number of parameters of each block (default 4)')
+	parser.add_argument('--enums', metavar='E', type=int, default=3, help='the number of enumerated values of each parameter (default 3)')
+	parser.add_argument('--io', metavar='K', type=int, default=2, help='the number of inputs and of outputs of each block (default 2)')
+	parser.add_argument('--locales', metavar='L', type=int, default=3, choices=range(len(LOCALES) + 1), help='the number of locales with a messages file, in addition to the default (default 3)')
+	parser.add_argument('--builtinParser', action='store_true', default=False, help='generate the block metadata with the built-in EPL parser instead of ApamaDoc')
+	parser.add_argument('--runs', metavar='N', type=int, default=3, help='the number of runs of each command, the fastest is reported (default 3)')
+	parser.add_argument('--maxExponent', metavar='K', type=float, default=1.5, help='the maximum scaling exponent between the smallest and the largest size (default 1.5)')
+	parser.add_argument('--baseline', metavar='JSON_FILE', help='the baseline to compare with, if it has the same configuration (default the baseline in baselines/ for the parser used, if there is one)')
+	parser.add_argument('--tolerance', metavar='FRACTION', type=float, default=0.5, help='the regression of the relative cost or memory use per block allowed compared to the baseline (default 0.5)')
+	parser.add_argument('--save', metavar='JSON_FILE', help='save the results to a JSON file, for example to update the baseline')
+	args = parser.parse_args()
+	if len(args.sizes) < 2 or min(args.sizes) < 2:
+		parser.error('at least two catalog sizes of 2 blocks or more are needed')
+
+	results = run_benchmark(args)
+	failures = []
+	for (kind, exponents) in results['scaling'].items():
+		print(f'{kind} scaling exponents: ' + ', '.join(f'{k}: {v}' for (k, v) in exponents.items()))
+		if exponents['overall'] > args.maxExponent:
+			failures.append(f'{kind} scaling exponent: {exponents["overall"]}, maximum {args.maxExponent}')
+	baselineFile = args.baseline or BASELINES[args.builtinParser]
+	if not args.baseline and not os.path.exists(baselineFile):
+		print(f'Not comparing with a baseline, {baselineFile} does not exist')
+	else:
+		with open(baselineFile, encoding='utf8') as f:
+			baseline = json.load(f)
+		if baseline.get('config') != results['config']:
+			print(f'Not comparing with the baseline {baselineFile}, which has a different configuration: {baseline.get("config")}')
+		else:
+			failures += compare(results, baseline, args.tolerance)
+	if args.save:
+		with open(args.save, 'w', encoding='utf8') as f:
+			json.dump(results, f, indent='\t')
+			f.write('\n')
+	for f in failures:
+		print(f'REGRESSION: {f}', file=sys.stderr)
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Check that the built-in EPL parser generates the same block metadata as ApamaDoc.
+
+With a full Apama installation, the block metadata and messages of samples/blocks are generated both with ApamaDoc and
+with the built-in parser and compared, reporting every difference, and --update saves the metadata generated with
+ApamaDoc in expected/samples-blocks-metadata.json. Without one, the metadata generated with the built-in parser is
+compared with that saved metadata, if it has been saved.
+
+The fixtures check the EPL which the built-in parser must convert (literal values of constants) or leave to ApamaDoc
+(events declared in monitors, values which are not literals).
+"""
+import argparse, json, os, sys, tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, '..', 'scripts'))
+import blockMetadataGenerator
+from checkApamaInstallation import confirmFullInstallation
+
+SAMPLE_BLOCKS = os.path.join(BENCHMARKS_DIR, '..', 'samples', 'blocks')
+EXPECTED = os.path.join(BENCHMARKS_DIR, 'expected', 'samples-blocks-metadata.json')
+FIXTURES = os.path.join(BENCHMARKS_DIR, 'fixtures')
+
+# The parameters expected from fixtures/literals, which is written so that they do not depend on ApamaDoc
+LITERALS_PARAMETERS = [
+	{'id': 'offset', 'name': 'Offset', 'description': 'A negative float default.', 'type': 'float', 'defaultValue': -1.5},
+	{'id': 'label', 'name': 'Label', 'description': 'A string default with escapes.', 'type': 'string', 'defaultValue': 'say "hi"\n\tto C:\\temp'},
+	{'id': 'mode', 'name': 'Mode', 'description': 'An integer enumeration with signed values.', 'type': 'integer', 'enumeratedValues': [
+		{'id': 'low', 'name': 'Low', 'value': -1},
+		{'id': 'high', 'name': 'High', 'value': 2},
+	]},
+]
+
+# The fixtures which the built-in parser cannot document, so that ApamaDoc must be used instead
+UNSUPPORTED_FIXTURES = ['eventInMonitor', 'expressionDefault']
+
+def generate(input, builtinParser):
+	"""
+	:return: Dictionary of the block metadata and the messages extracted from it.
+	"""
+	with tempfile.TemporaryDirectory(prefix='analytics_builder_metadata_') as tmp:
+		(metadata, messages) = blockMetadataGenerator.generate_metadata(input, tmp, builtinParser=builtinParser)
+	return json.loads(json.dumps({'metadata': metadata, 'messages': messages}))
+
+def differences(expected, actual, path=''):
+	"""
+	:return: List of the differences between two JSON values, with the path of each difference.
+	"""
+	if type(expected) != type(actual):
+		return [f'{path or "/"}: expected {json.dumps(expected)}, got {json.dumps(actual)}']
+	if isinstance(expected, dict):
+		return [d for k in sorted(set(expected) | set(actual), key=str) for d in
+			(differences(expected[k], actual[k], f'{path}/{k}') if k in expected and k in actual else
+			[f'{path}/{k}: {"missing" if k in expected else "unexpected"}'])]
+	if isinstance(expected, list):
+		diffs = [d for (i, (e, a)) in enumerate(zip(expected, actual)) for d in differences(e, a, f'{path}[{i}]')]
+		if len(expected) != len(actual):
+			diffs.append(f'{path}: expected {len(expected)} items, got {len(actual)}')
+		return diffs
+	return [] if expected == actual else [f'{path}: expected {json.dumps(expected)}, got {json.dumps(actual)}']
+
+def report(description, diffs):
+	"""
+	Print the result of a comparison.
+	:return: 1 if there are differences, otherwise 0.
+	"""
+	for d in diffs:
+		print(f'  {d}', file=sys.stderr)
+	if diffs:
+		print(f'FAILED  {description}: {len(diffs)} differences', file=sys.stderr)
+		return 1
+	print(f'PASSED  {description}')
+	return 0
+
+def check_fixtures(apamadoc):
+	"""
+	Check the metadata generated for the fixtures with the built-in parser.
+	:param apamadoc: Whether ApamaDoc can be run.
+	:return: The number of failed checks.
+	"""
+	failures = 0
+	literals = generate(os.path.join(FIXTURES, 'literals'), builtinParser=True)
+	failures += report('the built-in parser converts the literal values of constants',
+		differences(LITERALS_PARAMETERS, literals['metadata']['analytics'][0]['parameters']))
+	if apamadoc:
+		failures += report('the built-in parser converts the literal values of constants as ApamaDoc does',
+			differences(generate(os.path.join(FIXTURES, 'literals'), builtinParser=False), literals))
+
+	for fixture in UNSUPPORTED_FIXTURES:
+		input = os.path.join(FIXTURES, fixture)
+		if apamadoc:
+			failures += report(f'the built-in parser falls back to ApamaDoc for {fixture}',
+				differences(generate(input, builtinParser=False), generate(input, builtinParser=True)))
+			continue
+		try:
+			generate(input, builtinParser=True)
+			failures += report(f'the built-in parser refuses to document {fixture} without ApamaDoc', ['the metadata was generated'])
+		except Exception as ex:
+			failures += report(f'the built-in parser refuses to document {fixture} without ApamaDoc',
+				[] if 'The built-in EPL parser cannot document' in str(ex) else [f'unexpected error: {ex}'])
+	return failures
+
+def main():
+	parser = argparse.ArgumentParser(description='Check that the built-in EPL parser generates the same block metadata as ApamaDoc for samples/blocks.')
+	parser.add_argument('--update', action='store_true', default=False, help='save the metadata generated with ApamaDoc as the expected metadata, which requires a full Apama installation')
+	args = parser.parse_args()
+
+	try:
+		confirmFullInstallation()
+		apamadoc = True
+	except Exception as ex:
+		if args.update:
+			raise
+		print(f'Not generating the metadata with ApamaDoc: {ex}')
+		apamadoc = False
+
+	failures = check_fixtures(apamadoc)
+
+	if apamadoc:
+		expected = generate(SAMPLE_BLOCKS, builtinParser=False)
+		if args.update:
+			with open(EXPECTED, 'w', encoding='utf8') as f:
+				json.dump(expected, f, indent='\t', sort_keys=True)
+				f.write('\n')
+			print(f'Updated {EXPECTED}')
+		description = 'the metadata of samples/blocks generated with the built-in parser is the metadata generated with ApamaDoc'
+	elif os.path.exists(EXPECTED):
+		with open(EXPECTED, encoding='utf8') as f:
+			expected = json.load(f)
+		description = f'the metadata of samples/blocks generated with the built-in parser is the metadata generated with ApamaDoc in {os.path.relpath(EXPECTED, BENCHMARKS_DIR)}'
+	else:
+		print(f'SKIPPED no metadata generated with ApamaDoc to compare the metadata of samples/blocks with: run with a full Apama installation, with --update to save it')
+		return 1 if failures else 0
+
+	failures += report(description, differences(expected, generate(SAMPLE_BLOCKS, builtinParser=True)))
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Check that building an extension from the same sources produces the same zip.
+
+Builds the extension twice from copies of the same input directory whose files have different modification times and
+group permissions, as in a fresh checkout or a CI clone with another umask, and checks that the two zips have the same
+SHA-256 digest, which is what the upload compares with the digest of the extension in the inventory to skip uploading
+an unchanged extension. Also checks that a file which is executable in the input directory is still executable in the
+zip.
+"""
+import argparse, os, shutil, stat, sys, tempfile, time, zipfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, '..', 'scripts'))
+import buildExtension
+
+def build(input, directory, mtime, mode, builtinParser, executable=None):
+	"""
+	Build the extension from a copy of the input directory whose files all have the given modification time and mode.
+	:param executable: The path of a file relative to the input directory to make executable, if any.
+	:return: The path of the extension zip.
+	"""
+	source = os.path.join(directory, 'input')
+	shutil.copytree(input, source)
+	for (root, _, files) in os.walk(source):
+		for f in files:
+			os.utime(os.path.join(root, f), (mtime, mtime))
+			os.chmod(os.path.join(root, f), mode)
+	if executable:
+		os.chmod(os.path.join(source, executable), mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+	return buildExtension.build_extension(source, os.path.join(directory, 'extension'), os.path.join(directory, 'tmp'), builtinParser=builtinParser)
+
+def first_file(input):
+	"""
+	:return: The path relative to the input directory of its first file, or None if it has none.
+	"""
+	for (root, dirs, files) in os.walk(input):
+		dirs.sort()
+		for f in sorted(files):
+			return os.path.relpath(os.path.join(root, f), input)
+	return None
+
+def main():
+	parser = argparse.ArgumentParser(description='Check that building an extension twice from the same sources produces the same zip.')
+	parser.add_argument('--input', metavar='DIR', default=os.path.join(BENCHMARKS_DIR, '..', 'samples', 'blocks'), help='the extension input directory (default samples/blocks)')
+	parser.add_argument('--builtinParser', action='store_true', default=False, help='generate the block metadata with the built-in EPL parser instead of ApamaDoc')
+	args = parser.parse_args()
+
+	digests = []
+	for (mtime, mode) in ((time.time() - 86400, 0o644), (time.time(), 0o664)):
+		with tempfile.TemporaryDirectory(prefix='analytics_builder_reproducible_') as tmp:
+			digests.append(buildExtension.hash_file(build(args.input, tmp, mtime, mode, args.builtinParser)))
+	failures = 0
+	if digests[0] != digests[1]:
+		print(f'FAILED  the extension zips built from the same sources differ: {digests[0]} and {digests[1]}', file=sys.stderr)
+		failures += 1
+	else:
+		print(f'PASSED  the extension zips built from the same sources are identical: {digests[0]}')
+
+	executable = first_file(args.input)
+	if executable is None:
+		print(f'SKIPPED no file in {args.input} to check that it is still executable in the zip')
+		return 1 if failures else 0
+	with tempfile.TemporaryDirectory(prefix='analytics_builder_reproducible_') as tmp:
+		with zipfile.ZipFile(build(args.input, tmp, time.time(), 0o644, args.builtinParser, executable)) as zf:
+			modes = {i.filename: i.external_attr >> 16 for i in zf.infolist()}
+	arcname = 'files/' + executable.replace(os.sep, '/')
+	if modes.get(arcname) != 0o755 or any(m != 0o644 for (n, m) in modes.items() if n != arcname and not n.endswith('/')):
+		print(f'FAILED  only the executable file {arcname} is executable in the zip: {", ".join(f"{n} {m:o}" for (n, m) in sorted(modes.items()) if not n.endswith("/"))}', file=sys.stderr)
+		failures += 1
+	else:
+		print(f'PASSED  the executable file {arcname} is still executable in the zip')
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Benchmark of the start of the analytics_builder commands.
+
+Runs 'analytics_builder <command> --help' and 'python -c pass' alternately, and divides the time taken by the command
+by the time taken to start the Python interpreter alone, which makes the budgets independent of the speed of the
+machine. Fails if this ratio exceeds the budget of a command, or if a command imports a module it should not need, such
+as the block metadata generator for the commands which do not build anything, as listed by 'python -X importtime'.
+"""
+import argparse, os, re, statistics, subprocess, sys, time
+
+ANALYTICS_BUILDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analytics_builder')
+
+# Command to (budget of the start time as a multiple of the start time of the interpreter, modules it must not import)
+COMMANDS = {
+	'': (8, ['blockMetadataGenerator', 'buildExtension', 'buildServer', 'xml.etree.ElementTree', 'subprocess', 'zipfile']),
+	'build metadata': (12, ['buildExtension', 'eplDocParser', 'buildServer', 'urllib.request', 'zipfile']),
+	'build extension': (14, ['blockMetadataGenerator', 'eplDocParser', 'buildServer', 'xml.etree.ElementTree']),
+	'json extract': (14, ['blockMetadataGenerator', 'buildServer', 'xml.etree.ElementTree']),
+	'json pack': (14, ['blockMetadataGenerator', 'buildServer', 'xml.etree.ElementTree']),
+	'upload extension': (16, ['blockMetadataGenerator', 'buildServer', 'xml.etree.ElementTree']),
+	'list extensions': (16, ['blockMetadataGenerator', 'buildServer', 'xml.etree.ElementTree']),
+	'serve start': (9, ['blockMetadataGenerator', 'buildExtension', 'xml.etree.ElementTree', 'urllib.request']),
+	'serve stop': (9, ['blockMetadataGenerator', 'buildExtension', 'xml.etree.ElementTree', 'urllib.request']),
+}
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+def imported_modules(args):
+	"""
+	Run Python with -X importtime.
+	:param args: The arguments of Python.
+	:return: The set of all imported modules.
+	"""
+	result = subprocess.run([sys.executable, '-X', 'importtime'] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+	if result.returncode != 0:
+		raise Exception(f'Failed to run {args}: {result.stderr}')
+	return {m.group(4) for m in IMPORT_TIME.finditer(result.stderr)}
+
+def run_time(args):
+	"""
+	:return: The wall-clock time in seconds taken by Python to run with the given arguments.
+	"""
+	start = time.perf_counter()
+	result = subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+	if result.returncode != 0:
+		raise Exception(f'Failed to run {args}: {result.stderr}')
+	return time.perf_counter() - start
+
+def measure(command, runs):
+	"""
+	Measure the start time of a command relative to the start time of the interpreter alone.
+	:param command: The command and sub command, or an empty string for the main help.
+	:param runs: The number of runs of each, alternately, the medians are taken.
+	:return: Tuple of the start time in milliseconds, its ratio to the start time of the interpreter and the set of imported modules.
+	"""
+	args = [ANALYTICS_BUILDER] + command.split() + ['--help']
+	(base, times) = ([], [])
+	for _ in range(runs):
+		base.append(run_time(['-c', 'pass']))
+		times.append(run_time(args))
+	ms = statistics.median(times) * 1000
+	return (ms, ms / (statistics.median(base) * 1000), imported_modules(args))
+
+def main():
+	parser = argparse.ArgumentParser(description='Check that the analytics_builder commands start within their budget, relative to the start of the Python interpreter.')
+	parser.add_argument('--runs', metavar='N', type=int, default=5, help='the number of runs of each command, the median is compared to the budget (default 5)')
+	parser.add_argument('--scale', metavar='FACTOR', type=float, default=1.0, help='multiply the budgets by this factor (default 1.0)')
+	args = parser.parse_args()
+
+	failures = []
+	for (command, (budget, forbidden)) in COMMANDS.items():
+		(ms, ratio, modules) = measure(command, args.runs)
+		budget *= args.scale
+		unexpected = [m for m in forbidden if m in modules]
+		print(f'{command or "(main help)":<20} {ms:7.1f} ms  {ratio:5.1f} x python -c pass  (budget {budget:.1f} x)' + (f'  imports {", ".join(unexpected)}' if unexpected else ''))
+		if ratio > budget:
+			failures.append(f'{command or "main help"} took {ratio:.1f} times as long to start as the interpreter, more than its budget of {budget:.1f} times')
+		if unexpected:
+			failures.append(f'{command or "main help"} imports {", ".join(unexpected)}')
+	for f in failures:
+		print(f'FAILED: {f}', file=sys.stderr)
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
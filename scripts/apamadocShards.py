@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+import os, re, shutil
+
+# Comments and string literals, which must not be mistaken for references to other files
+EPL_NON_CODE = re.compile(r'/\*.*?\*/|//[^\n]*|"(?:\\.|[^"\\\n])*"', re.S)
+EPL_EVENT_DEFINITION = re.compile(r'\bevent\s+([A-Za-z_$][\w$]*)')
+EPL_IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+
+def scan_monitor(path):
+	"""
+	Scan a monitor file for the events it defines and the names it refers to.
+
+	This is a lexical scan, it does not parse EPL. It can find more references than the file actually has (for example
+	a local variable with the same name as an event in another file), which only makes the groups larger.
+	:param path: The .mon file.
+	:return: Tuple of the set of event names defined in the file and the set of all identifiers used in it.
+	"""
+	with open(path, encoding='utf8', errors='replace') as f:
+		code = EPL_NON_CODE.sub(' ', f.read())
+	return (set(EPL_EVENT_DEFINITION.findall(code)), set(EPL_IDENTIFIER.findall(code)))
+
+def group_monitors(mons):
+	"""
+	Group monitor files which refer to events defined in each other, directly or indirectly.
+
+	A block refers to its <block>_$Parameters event and to the events of its inputs and outputs, and these can be
+	defined in other files (imported with 'using'). ApamaDoc can only resolve the package of such a type if the file
+	defining it is documented in the same run, so files of the same group must be documented together.
+	:param mons: List of .mon files.
+	:return: List of groups, each a list of .mon files in the order of mons.
+	"""
+	parent = list(range(len(mons)))
+	def find(i):
+		while parent[i] != i:
+			parent[i] = parent[parent[i]]
+			i = parent[i]
+		return i
+
+	scanned = [scan_monitor(m) for m in mons]
+	definedIn = {}
+	for (i, (definitions, _)) in enumerate(scanned):
+		for name in definitions:
+			definedIn.setdefault(name, []).append(i)
+	for (i, (_, identifiers)) in enumerate(scanned):
+		for name in identifiers:
+			for j in definedIn.get(name, []):
+				parent[find(i)] = find(j)
+
+	groups = {}
+	for (i, m) in enumerate(mons):
+		groups.setdefault(find(i), []).append(m)
+	return list(groups.values())
+
+def plan_shards(mons, count):
+	"""
+	Split monitor files into shards that can be documented independently, keeping each group of related files together.
+
+	Groups are assigned largest first to the shard with the least content so far, so that the shards take about the
+	same time to document.
+	:param mons: List of .mon files.
+	:param count: The maximum number of shards.
+	:return: List of non-empty shards, each a list of .mon files.
+	"""
+	groups = [(sum(os.path.getsize(m) for m in g), g) for g in group_monitors(mons)]
+	groups.sort(key=lambda g: (-g[0], g[1][0]))
+	shards = [[] for _ in range(max(1, count))]
+	sizes = [0] * len(shards)
+	for (size, group) in groups:
+		i = sizes.index(min(sizes))
+		shards[i].extend(group)
+		sizes[i] += size
+	return [sorted(files) for files in shards if files]
+
+def link_or_copy(src, dst):
+	"""
+	Make a file available at another path as cheaply as possible: hard link it, or if that is not possible (for example
+	across file systems), symbolic link it, or else copy it.
+	:param src: The existing file.
+	:param dst: The new path, whose parent directory is created if needed.
+	"""
+	os.makedirs(os.path.dirname(dst), exist_ok=True)
+	try:
+		os.link(src, dst)
+	except OSError:
+		try:
+			os.symlink(os.path.abspath(src), dst)
+		except OSError:
+			shutil.copy2(src, dst)
+
+def stage_files(files, inputDir, stagingDir):
+	"""
+	Create a directory tree with only some of the files of an input directory, at the same relative paths.
+	:param files: The files to include, all under inputDir.
+	:param inputDir: The input directory.
+	:param stagingDir: The directory to create the tree in.
+	:return: The staging directory.
+	"""
+	for f in files:
+		link_or_copy(f, os.path.join(stagingDir, os.path.relpath(f, inputDir)))
+	return stagingDir
@@ -11,12 +11,17 @@ import sys
 import subprocess
 import json
 import xml.etree.cElementTree as ElementTree
+import concurrent.futures
 from subprocess import CalledProcessError
 from logging import Formatter
 from checkApamaInstallation import confirmFullInstallation
+import apamadocShards
+import buildProfiler
+from buildCache import BuildCache, hash_file
 import re
 
 FORMAT = '%(asctime)-15s %(levelname)s : %(message)s'
+SCRIPT_VERSION = '27.x.y'
 
 
 
@@ -254,24 +259,129 @@ class ValidateBlockDollarFields:
 		self.fieldWithMultipleOccurances = ['$replacesBlock', '$consumesInput', '$producesOutput']
 
 
-packageXPath = "./Package"
-blockIdentifierXPath = "./Type[@category='Event']/Member[@name=\"$base\"][@type=\"BlockBase\"][@package='apama.analyticsbuilder']/.."
-blockIdentifierXPathAlternate = "./Type[@category='Event']/Member[@name=\"$base\"][@type=\"apama.analyticsbuilder.BlockBase\"]/.."
-blockIdentifierCategoryXPath = "./DollarFields/DollarField[@name='$blockCategory']"
-blockIdentifierConsumesInputXPath = "./DollarFields/DollarField[@name='$consumesInput']"
-blockIdentifierProducesOutputXPath = "./DollarFields/DollarField[@name='$producesOutput']"
-blockTypeIdentifierTypeXPath = "./DollarFields/DollarField[@name='$blockType']/Description"
-blockTypeIdentifierDerivedNameXPath = "./DollarFields/DollarField[@name='$derivedName']/Description"
-blockTypeIdentifierTitleIsDerivedXPath = "./DollarFields/DollarField[@name='$titleIsDerived']/Description"
-blockTypeIdentifierIsPreviewBlockXPath = "./DollarFields/DollarField[@name='$isPreviewBlock']/Description"
-blockReplacesIdentifierXPath = "./DollarFields/DollarField[@name='$replacesBlock']/Description"
-inputIdentifierXPath = "./Action[@name=\"$process\"]/Parameters/Parameter"
-inputNameIdentifierXPath = "./Action[@name=\"$process\"]/DollarFields/DollarField[@name=\'$inputName\']/Description"
-outputIdentifierXPath = "./Member[@type=\"action\"]"
-defaultValueXPath = "./Member[@name=\'{0}\']"
-dollarFieldsXPath = "./DollarFields/DollarField"
-genericTagXPath = "./DollarFields/DollarField[@name='$%s']/Description"
-typeFieldsXPath = "./Package/Type"
+class StructureElement(object):
+	"""
+	A Type, Action, Member or Parameter element of structure.xml, with the children used for the block metadata indexed.
+
+	Only the attributes, the description, the dollar fields, the parameters, the members and the actions are kept.
+	"""
+	def __init__(self, element):
+		self.tag = element.tag
+		self.attrib = element.attrib
+		self.description = None		# first Description child
+		self.dollarFields = []		# ./DollarFields/DollarField
+		self.parameters = []		# ./Parameters/Parameter
+		self.members = []			# ./Member
+		self.membersByName = {}		# first ./Member for each name
+		self.actions = []			# ./Action
+		for child in element:
+			if child.tag == 'Description':
+				if self.description is None: self.description = child
+			elif child.tag == 'DollarFields':
+				self.dollarFields.extend(StructureElement(f) for f in child if f.tag == 'DollarField')
+			elif child.tag == 'Parameters':
+				self.parameters.extend(StructureElement(p) for p in child if p.tag == 'Parameter')
+			elif child.tag == 'Member':
+				member = StructureElement(child)
+				self.members.append(member)
+				if 'name' in member.attrib: self.membersByName.setdefault(member.attrib['name'], member)
+			elif child.tag == 'Action':
+				self.actions.append(StructureElement(child))
+
+	def get(self, key, default=None):
+		"""Return the value of an attribute."""
+		return self.attrib.get(key, default)
+
+	def namedMembers(self):
+		"""Return the members which have a name, in document order (./Member[@name])."""
+		return [m for m in self.members if 'name' in m.attrib]
+
+	def dollarField(self, name):
+		"""Return the first dollar field with the specified name, or None (./DollarFields/DollarField[@name=name])."""
+		return next((f for f in self.dollarFields if f.attrib.get('name') == name), None)
+
+	def dollarFieldDescriptions(self, name):
+		"""Return the descriptions of the dollar fields with the specified name (./DollarFields/DollarField[@name=name]/Description)."""
+		return [f.description for f in self.dollarFields if f.attrib.get('name') == name and f.description is not None]
+
+	def dollarFieldDescription(self, name):
+		"""Return the first description of the dollar fields with the specified name, or None."""
+		return next(iter(self.dollarFieldDescriptions(name)), None)
+
+	def typedParameter(self):
+		"""Return the first parameter which has a type, or None (./Parameters/Parameter[@type])."""
+		return next((p for p in self.parameters if 'type' in p.attrib), None)
+
+
+class StructureIndex(object):
+	"""
+	Index of the packages and types of a structure.xml file generated by ApamaDoc.
+
+	The index is built in a single pass, parsing the file incrementally and discarding each type element once it has
+	been indexed, so that only the parts used for the block metadata are kept in memory.
+	"""
+	def __init__(self):
+		self.packages = []	# list of (attributes of the Package element, list of StructureElement for its types)
+		self.types = {}		# (package name, type name, category) to the first StructureElement of the type
+
+	def _addPackage(self, packageAttrib):
+		types = []
+		self.packages.append((packageAttrib, types))
+		return types
+
+	def _addType(self, packageAttrib, types, typeObj):
+		types.append(typeObj)
+		self.types.setdefault((packageAttrib.get('name'), typeObj.attrib.get('name'), typeObj.attrib.get('category')), typeObj)
+
+	def findType(self, packageName, typeName, category='Event'):
+		"""Return the type with the specified name and category in a package, or None."""
+		return self.types.get((packageName, typeName, category))
+
+	@staticmethod
+	def fromFile(xmlPath):
+		"""Parse and index a structure.xml file."""
+		index = StructureIndex()
+		path = []		# tags of the currently open elements
+		package = None	# (element, types) of the current package
+		for (event, element) in ElementTree.iterparse(xmlPath, events=('start', 'end')):
+			if event == 'start':
+				path.append(element.tag)
+				if path[1:] == ['Package']:
+					package = (element, index._addPackage(element.attrib))
+				continue
+			path.pop()
+			if path[1:] == ['Package'] and element.tag == 'Type':
+				index._addType(package[0].attrib, package[1], StructureElement(element))
+				package[0].remove(element)	# everything needed has been indexed, so free the element
+		return index
+
+	@staticmethod
+	def fromElement(rootElement):
+		"""Index an already parsed structure.xml root element."""
+		index = StructureIndex()
+		for package in rootElement:
+			if package.tag != 'Package': continue
+			types = index._addPackage(package.attrib)
+			for typeElement in package:
+				if typeElement.tag == 'Type':
+					index._addType(package.attrib, types, StructureElement(typeElement))
+		return index
+
+	@staticmethod
+	def merge(indexes):
+		"""Merge the indexes of the structure.xml files of several ApamaDoc runs, combining the packages with the same name."""
+		merged = StructureIndex()
+		packages = {}
+		for index in indexes:
+			for (packageAttrib, types) in index.packages:
+				name = packageAttrib.get('name')
+				if name not in packages:
+					packages[name] = merged._addPackage(packageAttrib)
+				for typeObj in types:
+					merged._addType(packageAttrib, packages[name], typeObj)
+		return merged
+
+
 vanillaFieldTags = ['semanticType', 'displayType', 'minNumEntries', 'optional']
 headerFieldTags = [('displayHeaderName', 'name'), ('displayHeaderValue', 'value')]
 validFieldTags = vanillaFieldTags + [x[0] for x in headerFieldTags]
@@ -292,7 +402,7 @@ class BlockGenerator:
 
 	# Get default value from member type if any
 	def _getDefaultValue(self, typeElement, defaultFieldName):
-		member = typeElement.find(defaultValueXPath.format(defaultFieldName))
+		member = typeElement.membersByName.get(defaultFieldName)
 		if member is not None:
 			strValue = member.attrib.get('typeValue', '')
 			return json.loads(strValue)  # JSON is close enough
@@ -339,7 +449,8 @@ class BlockGenerator:
 		inputList = []
 		# fetch inputName parameters first
 		inputNameMap = dict()
-		for descriptionElement in typeElement.iterfind(inputNameIdentifierXPath):
+		processActions = [action for action in typeElement.actions if action.get('name') == '$process']
+		for descriptionElement in [d for action in processActions for d in action.dollarFieldDescriptions('$inputName')]:
 			if descriptionElement.text is None or descriptionElement.text.strip() == '':
 				continue
 			descriptionText = descriptionElement.text.strip()
@@ -350,7 +461,7 @@ class BlockGenerator:
 				inputNameMap[descriptionText] = ''
 
 		count = 0
-		for parameter in typeElement.iterfind(inputIdentifierXPath):
+		for parameter in [p for action in processActions for p in action.parameters]:
 			if 'name' in parameter.attrib and (len(parameter.attrib['name'].strip()) > 7) and parameter.attrib[
 				'name'].startswith('$input_', 0, 7):
 				try:
@@ -368,7 +479,7 @@ class BlockGenerator:
 					if defaultValue is not None:
 						typePassed = defaultValue
 					if typePassed.lower() == 'optional'.lower():  # if input is optional<T> type, then we are interested in only T.
-						t = parameter.find('./Parameters/Parameter[@type]')
+						t = parameter.typedParameter()
 						if t is not None:
 							typePassed = t.attrib['type']
 						else:
@@ -379,8 +490,8 @@ class BlockGenerator:
 					if inputId in inputNameMap and inputNameMap.get(inputId) != '':
 						inputName = inputNameMap.get(inputId)
 					inputObject = InputOutputHolder().setInputId(inputId).setType(typePassed).setName(inputName)
-					if parameter.find('Description') is not None:
-						description = parameter.find('Description')
+					if parameter.description is not None:
+						description = parameter.description
 						(_, descriptionField, extendDocsField) = self._parseDescription(description, containsName=False)
 						inputObject.setDescription(descriptionField)
 						inputObject.setExtendDocumentation(extendDocsField)
@@ -394,7 +505,7 @@ class BlockGenerator:
 	## Parse XML type element and generate list of Output Objects
 	def _createOutputElement(self, typeElement, block):
 		outputList = []
-		for outputMember in typeElement.iterfind(outputIdentifierXPath):
+		for outputMember in [m for m in typeElement.members if m.get('type') == 'action']:
 			if 'name' in outputMember.attrib and (len(outputMember.attrib['name'].strip()) > 11) and \
 					outputMember.attrib['name'].startswith('$setOutput_', 0, 11):
 				try:
@@ -403,7 +514,7 @@ class BlockGenerator:
 					block.addId(outputId, 'output')
 					outputEvent.setInputId(outputMember.attrib['name'][11:])
 
-					outputParameterElements = outputMember.findall('./Parameters/Parameter')
+					outputParameterElements = outputMember.parameters
 					if len(outputParameterElements) != 2:
 						print('Incorrect number of arguments found for output type. Argument count %d' % len(outputParameterElements), file=sys.stderr)
 						return outputList
@@ -416,7 +527,7 @@ class BlockGenerator:
 
 					defaultValue = self._getDefaultValue(typeElement, '$OUTPUT_TYPE_' + outputId.strip())
 					outputEvent.setType(defaultValue if (defaultValue is not None) else typePassed)
-					descriptionAll = outputMember.find('Description')
+					descriptionAll = outputMember.description
 					outputEvent.setName(outputMember.attrib['name'][11:])
 					if descriptionAll is not None:
 						(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
@@ -434,7 +545,7 @@ class BlockGenerator:
 		is_optional = False
 		member_type = None
 		def handleSequence(seqMember):
-			seqUnderlyingType = seqMember.find('./Parameters/Parameter[@type]')  # sequence <T>
+			seqUnderlyingType = seqMember.typedParameter()  # sequence <T>
 			if seqUnderlyingType is not None:
 				seqMemberType = seqUnderlyingType.attrib['type']
 				member_type = 'sequence<' + seqMemberType + '>'
@@ -446,7 +557,7 @@ class BlockGenerator:
 			self.raiseError("Parameter type is missing. ")
 		elif member.attrib.get('type').lower() == 'optional'.lower():
 			is_optional = True  # optional <T>; note that T may or may not be a sequence.
-			t = member.find('./Parameters/Parameter[@type]')
+			t = member.typedParameter()
 			if t is not None:
 				member_type = t.attrib['type']
 				if member_type.lower() == 'sequence'.lower():
@@ -479,16 +590,15 @@ class BlockGenerator:
 			)
 
 	# Create Parameter List
-	def _createParameterList(self, typeElement, xmlRootElement, block):
+	def _createParameterList(self, typeElement, structureIndex, block):
 		parameterList = []
 		parameterNameSearch = typeElement.attrib.get('name').strip() + '_$Parameters'
-		parameterMember = typeElement.find('./Member[@type=\'' + parameterNameSearch + '\']')
+		parameterMember = next((m for m in typeElement.members if m.get('type') == parameterNameSearch), None)
 		# Fetch the fully qualified name of the parameter from the Block Field Name
 		if parameterMember is not None:
 			packageName = parameterMember.attrib.get('package', '')
-			# Search the XML Tree for any Event of type 'parameterNameSearch' under package 'packageName'
-			parameterTypeElement = xmlRootElement.find(
-				'./Package[@name=\'' + packageName + '\']/Type[@category=\'Event\'][@name=\'' + parameterNameSearch + '\']')
+			# Look up the Event of type 'parameterNameSearch' under package 'packageName'
+			parameterTypeElement = structureIndex.findType(packageName, parameterNameSearch)
 
 			if parameterTypeElement is None:
 				print('Parameter Element not found in XML. Parameter Type = {0}.{1}'.format(packageName,
@@ -497,7 +607,7 @@ class BlockGenerator:
 
 			memberToEnumVals = self._createEnumeratedValues(parameterTypeElement)
 
-			for member in parameterTypeElement.iterfind('./Member[@name]'):
+			for member in parameterTypeElement.namedMembers():
 				try:
 					if 'constant' in member.attrib:
 						continue  # skip constant members as they are not parameters, they are just used to capture enum values.
@@ -511,7 +621,7 @@ class BlockGenerator:
 						parameterObject = Parameter().setParameterId(parameterId)
 
 						for extraTag in vanillaFieldTags:
-							tag = member.find(genericTagXPath % extraTag)
+							tag = member.dollarFieldDescription('$' + extraTag)
 							
 							if tag is not None:
 								if extraTag == 'semanticType':
@@ -528,7 +638,7 @@ class BlockGenerator:
 									parameterObject.set(extraTag, tag.text.strip())
 
 						for extraTag, name in headerFieldTags:
-							tag = member.find(genericTagXPath % extraTag)
+							tag = member.dollarFieldDescription('$' + extraTag)
 							if tag is not None and tag.text is not None:
 								parameterObject.setHeader(name, tag.text.strip())
 
@@ -541,7 +651,7 @@ class BlockGenerator:
 						parameterObject.setName(parameterId)
 
 						# get description
-						descriptionAll = member.find('Description')
+						descriptionAll = member.description
 						if descriptionAll is not None:
 							(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
 							parameterObject.setDescription(descriptionField).setExtendDocumentation(extendDocsField)
@@ -566,102 +676,113 @@ class BlockGenerator:
 
 		# for string of parent parameter to list of enumValues
 		memberToEnumVals = dict()
+		constMembers = []
 
-		# first capture non-constant members into dict as keys.
-		for member in parameterTypeElement.iterfind('./Member[@name]'):
+		# Single pass over the members: capture non-constant members into dict as keys, and the constant members
+		# which may be their enum values.
+		for member in parameterTypeElement.namedMembers():
 			try:
 				parameter_type, _, is_supported_type = self.get_member_type(member)
-				if 'constant' not in member.attrib \
-						and is_supported_type:
-					key = self._getKeyForEnumMapping(member)
-					memberToEnumVals[key] = []  # populate this list while processing constant members
-
+				if not is_supported_type:
+					continue
+				# as _getTypeUnderscoreName, without getting the type of the member again
+				typeUnderscoreName = (parameter_type or '') + '_' + member.attrib.get('name').strip('\t ')
+				if 'constant' in member.attrib:
+					constMembers.append((member, typeUnderscoreName))
+				else:
+					memberToEnumVals[typeUnderscoreName + '_'] = []  # key as _getKeyForEnumMapping, populate this list while processing constant members
 			except (KeyError, RuntimeError) as err:
 				raise Exception('Error parsing parameter Elements: %s' %err)
 
-		keyList = list(memberToEnumVals.keys())
-		# Algo in short: Reverse the list to get the longest matching prefix.
-		# Let's say, an enum val named 'foobarbar' is up for grabbing, and there exists two
-		# parent parameter named 'foo' and 'foobar' of matching type, then in that case
-		# the later one i.e. 'foobar' should be the clear winner in grabbing the enum val.
-		keyList.sort(reverse=True)
-
 		# now capture matching constant members into dict as corresponding values.
-		for member in parameterTypeElement.iterfind('./Member[@name]'):
+		for (member, constVal) in constMembers:
 			try:
-				parameter_type, _, is_supported_type = self.get_member_type(member)
-				if 'constant' in member.attrib \
-						and is_supported_type:
-
-					constVal = self._getTypeUnderscoreName(member)
-					for parentMember in keyList:
-						if constVal.startswith(parentMember):
-							enumId = constVal[
-							         len(parentMember):]  # trim out parent-name from the parent-name-prefixed-enums
-							enumVal = EnumeratedValues().setId(enumId)  # create the enum value
-
-							descriptionAll = member.find('Description')
-							if descriptionAll is not None:
-								(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
-								enumVal.setName(nameField)  # nameField is treated as name in case of enums
-								if descriptionField: enumVal.setDescription(descriptionField)  # used for tooltip
-							else:
-								enumVal.setName(enumId)
-								print('No apamadoc found for the name of enum : %s' % member.attrib.get('name').strip('\t '), file=sys.stderr)
-
-							enumVal.setValue(json.loads(member.attrib.get('typeValue')))
-
-							memberToEnumVals[parentMember].append(
-								enumVal.getUnderlyingDataMap())  # chain it to corresponding list
-							break
+				parentMember = self._longestEnumKeyPrefix(constVal, memberToEnumVals)
+				if parentMember is not None:
+					enumId = constVal[
+					         len(parentMember):]  # trim out parent-name from the parent-name-prefixed-enums
+					enumVal = EnumeratedValues().setId(enumId)  # create the enum value
+
+					descriptionAll = member.description
+					if descriptionAll is not None:
+						(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
+						enumVal.setName(nameField)  # nameField is treated as name in case of enums
+						if descriptionField: enumVal.setDescription(descriptionField)  # used for tooltip
+					else:
+						enumVal.setName(enumId)
+						print('No apamadoc found for the name of enum : %s' % member.attrib.get('name').strip('\t '), file=sys.stderr)
+
+					enumVal.setValue(json.loads(member.attrib.get('typeValue')))
+
+					memberToEnumVals[parentMember].append(
+						enumVal.getUnderlyingDataMap())  # chain it to corresponding list
 			except (KeyError, RuntimeError) as err:
 				print('Error parsing parameter Elements: %s' %err, file=sys.stderr)
 
 		return memberToEnumVals
 
+	@staticmethod
+	def _longestEnumKeyPrefix(constVal, enumKeys):
+		"""
+		Find the parameter an enum value belongs to: the one with the longest key prefixing the enum value.
+		Let's say, an enum val named 'foobar_bar' is up for grabbing, and there exists two parent parameter named 'foo'
+		and 'foobar' of matching type, then in that case the later one i.e. 'foobar' should be the clear winner in
+		grabbing the enum val. As the keys end with '_', only the prefixes of the enum value ending at one of its
+		underscores are looked up, longest first.
+		:param constVal: The type and name of the constant, as returned by _getTypeUnderscoreName.
+		:param enumKeys: The keys of the parameters, as returned by _getKeyForEnumMapping.
+		:return: The matching key, or None if there is none.
+		"""
+		i = constVal.rfind('_')
+		while i >= 0:
+			if constVal[:i + 1] in enumKeys:
+				return constVal[:i + 1]
+			i = constVal.rfind('_', 0, i)
+		return None
+
 	## create Block object from the xml element passed
-	def _createBlock(self, blockId, typeElement, xmlRootElement):
+	def _createBlock(self, blockId, typeElement, structureIndex):
 
 		# set Block Id
 		block = Block().setBlockId(blockId)
 		# set Block Group
-		blockCategory = typeElement.find(blockIdentifierCategoryXPath + '/Description')
+		blockCategory = typeElement.dollarFieldDescription('$blockCategory')
 		if blockCategory is not None and blockCategory.text is not None:
 			block.setBlockCategory(blockCategory.text.strip())
 
 		# check and set consumesInput
-		consumesInput = typeElement.find(blockIdentifierConsumesInputXPath)
+		consumesInput = typeElement.dollarField('$consumesInput')
 		if consumesInput is not None:
 			block.setBlockConsumesInput()
 
 		# check and set consumesInput
-		producesOutput = typeElement.find(blockIdentifierProducesOutputXPath)
+		producesOutput = typeElement.dollarField('$producesOutput')
 		if producesOutput is not None:
 			block.setBlockProducesOutput()
 
 		# set Block Type
-		blockType = typeElement.find(blockTypeIdentifierTypeXPath)
+		blockType = typeElement.dollarFieldDescription('$blockType')
 		if blockType is not None and blockType.text is not None:
 			block.setBlockType(blockType.text.strip())
 		# set Derived Name for the block
-		derivedName = typeElement.find(blockTypeIdentifierDerivedNameXPath)
+		derivedName = typeElement.dollarFieldDescription('$derivedName')
 		if derivedName is not None and derivedName.text is not None:
 			block.setBlockDerivedName(derivedName.text.strip())
 		# set isPreviewBlock for the block
-		isPreviewBlock = typeElement.find(blockTypeIdentifierIsPreviewBlockXPath)
+		isPreviewBlock = typeElement.dollarFieldDescription('$isPreviewBlock')
 		if isPreviewBlock is not None and isPreviewBlock.text.lower() != 'false':
 			block.setIsPreviewBlock(isPreviewBlock.text.strip())
 		# set titleIsDerived Name for the block
-		titleIsDerived = typeElement.find(blockTypeIdentifierTitleIsDerivedXPath)
+		titleIsDerived = typeElement.dollarFieldDescription('$titleIsDerived')
 		if titleIsDerived is not None and titleIsDerived.text != 'false':
 			block.setTitleIsDerived(titleIsDerived.text.strip())
 		# set block to replace.
-		replacesBlockList = typeElement.findall(blockReplacesIdentifierXPath)
+		replacesBlockList = typeElement.dollarFieldDescriptions('$replacesBlock')
 		for replacesBlock in replacesBlockList:
 			if replacesBlock is not None and replacesBlock.text is not None:
 				block.setBlockReplacementList(replacesBlock.text.strip())
 		# parse description field to blockName, Description and Extended Documentation
-		descriptionAll = typeElement.find('Description')
+		descriptionAll = typeElement.description
 		if descriptionAll is not None and descriptionAll.text is not None:
 			(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
 			block.setBlockName(nameField).setDescription(
@@ -671,27 +792,38 @@ class BlockGenerator:
 		# set Output Events List
 		block.setOutputEventJsonList(self._createOutputElement(typeElement, block))
 		# set Parameter List
-		block.setParameterJsonList(self._createParameterList(typeElement, xmlRootElement, block))
+		block.setParameterJsonList(self._createParameterList(typeElement, structureIndex, block))
 
 		return block
 
-	## Parse input xmlRootElement and return map of blockId and Block object
-	def getAllValidBlockElements(self, xmlRootElement):
-		self.validateTags(xmlRootElement)
+	# Check if the type is an Event with a '$base' member of the BlockBase type
+	def _isBlockType(self, typeElement, alternate=False):
+		if typeElement.get('category') != 'Event': return False
+		for member in typeElement.members:
+			if member.get('name') != '$base': continue
+			if alternate and member.get('type') == 'apama.analyticsbuilder.BlockBase': return True
+			if not alternate and member.get('type') == 'BlockBase' and member.get('package') == 'apama.analyticsbuilder': return True
+		return False
+
+	## Parse input structure index (or xmlRootElement) and return map of blockId and Block object
+	def getAllValidBlockElements(self, structureIndex):
+		if not isinstance(structureIndex, StructureIndex):
+			structureIndex = StructureIndex.fromElement(structureIndex)
+		self.validateTags(structureIndex)
 		blockList = []
-		for package in xmlRootElement.findall(packageXPath):
+		for (package, types) in structureIndex.packages:
 			# search all Events which has 'apama.analytics.BaseBlock $base' member
-			eventTypeList = package.findall(blockIdentifierXPath)
-			eventTypeList.extend(package.findall(blockIdentifierXPathAlternate))
+			eventTypeList = [t for t in types if self._isBlockType(t)]
+			eventTypeList.extend(t for t in types if self._isBlockType(t, alternate=True))
 
 			for element in eventTypeList:
 				# check if Event type contains DollarField blockCategory
-				if element.find(blockIdentifierCategoryXPath) is not None:
-					if package.attrib['name'].strip() == '':
+				if element.dollarField('$blockCategory') is not None:
+					if package['name'].strip() == '':
 						raise RuntimeError('Event definition for block should be defined inside a package. Package name is missing for event %s' % element.attrib['name'].strip())
-					blockId = package.attrib['name'].strip() + '.' + element.attrib['name'].strip()
+					blockId = package['name'].strip() + '.' + element.attrib['name'].strip()
 
-					blockObj = self._createBlock(blockId, element, xmlRootElement)
+					blockObj = self._createBlock(blockId, element, structureIndex)
 					if blockObj == None:
 						print('Error extracting block for event %s' % blockId, file=sys.stderr)
 						continue
@@ -701,19 +833,20 @@ class BlockGenerator:
 						element.attrib['name'], file=sys.stderr)
 		return blockList
 
-	## Parse input XML ElementTree and return the root element
-	def getRootElement(self, xmlPath):
+	## Parse input structure.xml file into a StructureIndex
+	def getStructureIndex(self, xmlPath):
 		try:
-			xmlTree = ElementTree.parse(xmlPath)
-			return xmlTree.getroot()
+			with buildProfiler.phase('XML parse') as record:
+				record.add(os.path.getsize(xmlPath), 1)
+				return StructureIndex.fromFile(xmlPath)
 		except:
 			raise RuntimeError(sys.exc_info()[1])
 
 	## Validate all the @$tags for their valid names and locations
-	def validateTags(self, xmlRootElement):
-		parentList = xmlRootElement.findall(typeFieldsXPath)
+	def validateTags(self, structureIndex):
+		parentList = [t for (_, types) in structureIndex.packages for t in types]
 		for parent in parentList:
-			tagsOnEventList = parent.findall(dollarFieldsXPath)
+			tagsOnEventList = parent.dollarFields
 			validator = ValidateBlockDollarFields()
 			for dollarTag in tagsOnEventList:
 				tagName = dollarTag.attrib['name'].strip()
@@ -723,37 +856,36 @@ class BlockGenerator:
 				if tagName in validator.data:
 					validator.data[tagName] = True
 				description = None
-				if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-					description = dollarTag.find('Description').text.strip()
+				if dollarTag.description is not None and dollarTag.description.text is not None:
+					description = dollarTag.description.text.strip()
 
 				self.validateTag(parent, None, tagName, description)
 
-			actionTags = parent.findall("./Action")
+			actionTags = parent.actions
 			for actionTag in actionTags:
-				tagsOnActionList = actionTag.findall(dollarFieldsXPath)
+				tagsOnActionList = actionTag.dollarFields
 				for dollarTag in tagsOnActionList:
 					tagName = dollarTag.attrib['name'].strip()
 					description = None
-					if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-						description = dollarTag.find('Description').text.strip()
+					if dollarTag.description is not None and dollarTag.description.text is not None:
+						description = dollarTag.description.text.strip()
 
 					self.validateTag(actionTag, parent, tagName, description)
 
-			memberTags = parent.findall("./Member")
+			memberTags = parent.members
 			for memberTag in memberTags:
-				tagsOnMemberList = memberTag.findall(dollarFieldsXPath)
+				tagsOnMemberList = memberTag.dollarFields
 				for dollarTag in tagsOnMemberList:
 					tagName = dollarTag.attrib['name'].strip()
 					description = None
-					if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-						description = dollarTag.find('Description').text.strip()
+					if dollarTag.description is not None and dollarTag.description.text is not None:
+						description = dollarTag.description.text.strip()
 
 					self.validateTag(memberTag, parent, tagName, description)
 
 	def validateCategoryOrTypeName(self, parentElement, grandParentElement, tagName, description):
 		if 'category' not in parentElement.attrib or not parentElement.attrib[
-			                                                 'category'] == 'Event' or parentElement.find(
-			'./Member[@name=\"$base\"]') is None:
+			                                                 'category'] == 'Event' or '$base' not in parentElement.membersByName:
 			parentName = self.getElementName(parentElement)
 			grandParentName = self.getElementName(grandParentElement)
 			errorMessage = self.createErrorMessage(parentName, grandParentName, tagName,
@@ -816,13 +948,16 @@ class BlockGenerator:
 
 
 class ScriptRunner:
-	def __init__(self, apama_home, outputFile, inputDir, tmpDir, version):
+	def __init__(self, apama_home, outputFile, inputDir, tmpDir, version, jobs=1, cacheDir=None, builtinParser=False, manifest=None):
 		self.apamaHome = apama_home
-		self.outputFile = os.path.abspath(outputFile)
+		self.outputFile = os.path.abspath(outputFile) if outputFile else None
 		self.inputDir = os.path.abspath(inputDir)
 		self.tmpDir = os.path.abspath(tmpDir)
 		self.scriptVersion = version
-
+		self.jobs = jobs
+		self.cacheDir = cacheDir
+		self.builtinParser = builtinParser
+		self.manifest = manifest
 
 	nestedProperties = ['inputs', 'outputs', 'parameters']
 	simpleProperties = ['name', 'description', 'extendedDescription', 'displayType', 'derivedName']
@@ -866,18 +1001,101 @@ class ScriptRunner:
 						results.update({obj_id + self.SEP_UNDERSCORE + self.DISPLAY_HEADER + self.SEP_UNDERSCORE + p: self._mangleBraces(dispobj[p])})
 		return results
 
-	def _generateJSONoutput(self, structureXMLPath):
+	def _documentMonitors(self, mons):
+		"""
+		Get the Apama Doc of monitors, either from ApamaDoc or from the built-in EPL parser.
+		:param mons: The monitors in the input directory to document.
+		:return: Tuple of the StructureIndex of the Apama Doc, and whether it was merged from several ApamaDoc runs, in
+		which case the order of its types is not that of a single ApamaDoc run.
+		"""
+		if self.builtinParser:
+			import eplDocParser
+			try:
+				with buildProfiler.phase('EPL parse') as record:
+					record.add(sum(os.path.getsize(m) for m in mons), len(mons))
+					return (StructureIndex.fromElement(eplDocParser.parse_monitors(mons)), False)
+			except eplDocParser.UnsupportedEPL as ex:
+				try:
+					confirmFullInstallation()
+				except Exception as noApamaDoc:
+					raise Exception('The built-in EPL parser cannot document %s, and ApamaDoc cannot be run instead: %s' % (ex, noApamaDoc))
+				print('The built-in EPL parser cannot document %s, running ApamaDoc instead' % ex, file=sys.stderr)
 		blockGeneratorLogic = BlockGenerator()
+		structureXmls = self._generateApamaDocs(mons)
+		return (StructureIndex.merge([blockGeneratorLogic.getStructureIndex(p) for p in structureXmls]), len(structureXmls) > 1)
+
+	def _getBlocks(self, mons):
+		"""
+		Document monitors and extract their blocks.
+		:param mons: The monitors in the input directory to document.
+		:return: List of the block data maps, in the order of the types in structure.xml, or ordered by id if there is
+		no single structure.xml.
+		"""
+		(structureIndex, merged) = self._documentMonitors(mons)
+		with buildProfiler.phase('block elements') as record:
+			blockList = BlockGenerator().getAllValidBlockElements(structureIndex)
+			record.add(items=len(blockList))
+		if merged:
+			blockList.sort(key=lambda block: block['id'])
+		return blockList
+
+	def _digest(self, path):
+		return self.manifest.digest(path) if self.manifest else hash_file(path)
+
+	def _generateCachedBlockList(self, mons):
+		"""
+		Generate the blocks, reusing the blocks of the unchanged files from the cache.
+
+		The monitors are cached in groups of files which refer to each other, keyed on the content of all the files of
+		the group. Only the groups with a changed file are documented again.
+		:param mons: The monitors in the input directory.
+		:return: List of the block data maps.
+		"""
+		cache = BuildCache(self.cacheDir)
+		apamadoc = None if self.builtinParser else apama_version(cache)
+		blockList = []
+		changed = []
+		for group in apamadocShards.group_monitors(mons):
+			key = cache.key('blocks', self.scriptVersion, parser_version(self.builtinParser), apamadoc, sorted((os.path.relpath(m, self.inputDir), self._digest(m)) for m in group))
+			entry = cache.get('blocks', key)
+			if entry:
+				blockList.extend(json.loads((entry / 'blocks.json').read_text(encoding=self.ENCODING)))
+			else:
+				changed.append((group, key))
+		if not changed:
+			blockList.sort(key=lambda block: block['id'])
+			return blockList
+
+		changedMons = sorted(m for (group, _) in changed for m in group)
+		newBlockList = self._getBlocks(changedMons)
+		blockList.extend(newBlockList)
+		blockList.sort(key=lambda block: block['id'])
+
+		# Store the new blocks with the group of the file which defines the block event
+		groupOfEvent = {}
+		for (i, (group, _)) in enumerate(changed):
+			for m in group:
+				for eventName in apamadocShards.scan_monitor(m)[0]:
+					groupOfEvent[eventName] = i
+		groupBlocks = [[] for _ in changed]
+		for block in newBlockList:
+			eventName = block['id'].rsplit('.', 1)[-1]
+			if eventName not in groupOfEvent:
+				return blockList # cannot tell where the block is defined, so do not cache anything
+			groupBlocks[groupOfEvent[eventName]].append(block)
+		for ((_, key), blocks) in zip(changed, groupBlocks):
+			cache.put('blocks', key, {'blocks.json': bytes(json.dumps(blocks), encoding=self.ENCODING)})
+		return blockList
+
+	def _generateJSONoutput(self, blockList):
 		metaDataHolder = MetaDataHolder()
 		metaDataHolder.setVersion(self.scriptVersion)
-		root = blockGeneratorLogic.getRootElement(structureXMLPath)
-		if root is None:
-			raise Exception('Cannot generate block metadata because of empty structure.xml file: %s', structureXMLPath)
-		blockList = blockGeneratorLogic.getAllValidBlockElements(root)
 		metaDataHolder.setBlockList(blockList)
 
-		with open(self.outputFile, 'w') as file:
-			metaDataHolder.writeJsonToFile(file)
+		if self.outputFile:
+			with buildProfiler.phase('metadata JSON') as record, open(self.outputFile, 'w') as file:
+				metaDataHolder.writeJsonToFile(file)
+				record.add(file.tell())
 		messages={}
 		for block in blockList:
 			block_id =  self.BLOCK_PREFIX + self.SEP_UNDERSCORE + block[self.uniqueIdentifiers[1]]
@@ -890,25 +1108,24 @@ class ScriptRunner:
 				r = self._extractProperty(block[property], block_id + self.SEP_UNDERSCORE + property, self.uniqueIdentifiers[1], self.simpleProperties)
 				messages.update(r)
 
-		return (messages, blockList)
+		return (messages, metaDataHolder)
 
-	#Generate Apama Docs for each Catalog list and parse the structure.xml to create Block JSON file
-	def _generateApamaDocs(self):
+	def _runApamaDoc(self, inputDir, outputDir):
 		"""
-		Generate Apama Doc for all the monitors in the specified directory.
+		Run ApamaDoc for all the monitors in a directory.
+		:param inputDir: The directory containing the monitors.
+		:param outputDir: The directory to generate the Apama Doc in. The log files are created next to it.
 		:return: Path to the generated structure.xml
 		"""
-		confirmFullInstallation()
-		apamaDocErrLog = os.path.join(self.tmpDir, 'apamadoc_err.log')
-		apamaDocOutLog = os.path.join(self.tmpDir, 'apamadoc_out.log')
-		
-		apamaDocOutput = os.path.join(self.tmpDir, 'apamadoc')
-		if not os.path.exists(apamaDocOutput):
-			os.makedirs(apamaDocOutput)
+		apamaDocErrLog = outputDir + '_err.log'
+		apamaDocOutLog = outputDir + '_out.log'
+
+		if not os.path.exists(outputDir):
+			os.makedirs(outputDir)
 		cmd = [
 			os.path.join(self.apamaHome, 'bin', 'apamadoc'),
-			apamaDocOutput,
-			self.inputDir,
+			outputDir,
+			inputDir,
 		]
 
 		with open(apamaDocErrLog, 'w+') as errFile:
@@ -919,20 +1136,58 @@ class ScriptRunner:
 					print('Error while generating Apama Doc from %s. Please check %s file for more details' %
 						(self.inputDir, os.path.abspath(apamaDocErrLog)), file=sys.stderr)
 					raise err
-		return os.path.join(apamaDocOutput, 'structure.xml')
+		structureXml = os.path.join(outputDir, 'structure.xml')
+		if not os.path.isfile(structureXml):
+			raise Exception('Cannot generate block metadata because %s file was not generated' % structureXml)
+		return structureXml
+
+	#Generate Apama Docs for each Catalog list and parse the structure.xml to create Block JSON file
+	def _generateApamaDocs(self, mons):
+		"""
+		Generate Apama Doc for monitors in the input directory.
+
+		ApamaDoc is run on a directory with links to only the monitors, so that it does not traverse the other files of
+		the input directory, such as models or other large assets. If more than one job is allowed, the monitors are split
+		into shards of related files, each staged in its own directory and documented by concurrent ApamaDoc runs.
+		:param mons: The monitors in the input directory to document.
+		:return: List of paths to the generated structure.xml files.
+		"""
+		confirmFullInstallation()
+		shards = apamadocShards.plan_shards(mons, self.jobs) if self.jobs > 1 else [mons]
+
+		def documentShard(i):
+			with buildProfiler.phase('ApamaDoc') as record:
+				record.add(sum(os.path.getsize(m) for m in shards[i]), len(shards[i]))
+				shardDir = os.path.join(self.tmpDir, 'apamadoc_shards', str(i))
+				shardInput = apamadocShards.stage_files(shards[i], self.inputDir, os.path.join(shardDir, 'input'))
+				return self._runApamaDoc(shardInput, os.path.join(shardDir, 'apamadoc'))
+
+		if len(shards) == 1:
+			return [documentShard(0)]
+		# Each shard runs in its own ApamaDoc process, the threads only wait for them
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+			return list(executor.map(documentShard, range(len(shards))))
 
 	
 	#validate Catalog path and calls _generateApamaDocs to generate Apamadocs and then Metadata json
 	def generateBlockMetaData(self):
-		if not list(glob.glob(self.inputDir + '/**/*.mon', recursive=True)): 
+		"""
+		Generate the block metadata, and write it to the output file if there is one.
+		:return: Tuple of the metadata object (None if there are no input files) and the messages extracted from it.
+		"""
+		if self.manifest:
+			mons = self.manifest.mons()
+		else:
+			mons = sorted(glob.glob(self.inputDir + '/**/*.mon', recursive=True))
+		if not mons: 
 			print("No input files found", file=sys.stderr)
 			return (None, {})
-		structureXml = self._generateApamaDocs()
-		if os.path.isfile(structureXml):
-			(msgs, blocks)=self._generateJSONoutput(structureXml)
+		if self.cacheDir:
+			blockList = self._generateCachedBlockList(mons)
 		else:
-			raise Exception('Cannot generate block metadata because %s file was not generated', structureXml)
-		return (self.outputFile, msgs)
+			blockList = self._getBlocks(mons)
+		(msgs, metaDataHolder)=self._generateJSONoutput(blockList)
+		return (metaDataHolder.data, msgs)
 
 class STDOUTFilter(logging.Filter):
 	def filter(self, record):
@@ -941,20 +1196,76 @@ class STDOUTFilter(logging.Filter):
 def add_arguments(parser):
 	parser.add_argument('--input', metavar='DIR', type=str, required=True, help='the input directory containing blocks')
 	parser.add_argument('--output', metavar='JSON_FILE', type=str, required=True, help='the output JSON file containing the metadata for blocks')
-
-def run_metadata_generator(input, output, tmpDir, printMsg=False):
-	confirmFullInstallation()
+	parser.add_argument('--jobs', metavar='N', type=int, default=1, required=False, help='the maximum number of ApamaDoc processes to run concurrently, each documenting a shard of related block files (default 1)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help='the directory of a persistent cache of the metadata of the blocks; only the block files which have changed are documented again')
+	parser.add_argument('--builtinParser', action='store_true', default=False, required=False, help='extract the Apama Doc of the blocks with the built-in EPL parser instead of running ApamaDoc, which does not need a full Apama installation')
+	parser.add_argument('--profile', metavar='JSON_FILE', type=str, required=False, help='write the time taken by each phase of the generation to a JSON file, in the Chrome trace event format')
+
+def parser_version(builtinParser):
+	"""
+	:return: The version of the built-in EPL parser if it is used, for the cache keys, otherwise False.
+	"""
+	if not builtinParser: return False
+	import eplDocParser
+	return eplDocParser.VERSION
+
+APAMA_TOOLS = ['bin/engine_package', 'bin/apamadoc', 'lib/ap-generate-apamadoc.jar']
+
+def apama_version(cache):
+	"""
+	Identify the Apama installation which builds the CDP files and documents the blocks, for the cache keys.
+	:param cache: The BuildCache object, which keeps the content hashes of the tools until they change.
+	:return: List of the real path of APAMA_HOME and the content hashes of the tools it has, or None if APAMA_HOME is not set.
+	"""
+	apama_home = os.getenv('APAMA_HOME', None)
+	if not apama_home: return None
+	apama_home = os.path.realpath(apama_home)
+	tools = []
+	for tool in APAMA_TOOLS:
+		try:
+			st = os.stat(os.path.join(apama_home, tool))
+		except OSError:
+			continue
+		tools.append((os.path.join(apama_home, tool), [st.st_size, st.st_mtime_ns, st.st_ino]))
+	digests = cache.file_digests(tools)
+	return [apama_home, sorted((os.path.relpath(path, apama_home), digest) for (path, digest) in digests.items())]
+
+def generate_metadata(input, tmpDir, output=None, jobs=1, cacheDir=None, builtinParser=False, manifest=None):
+	"""
+	Generate the block metadata for the blocks in a directory.
+	:param input: The input directory containing blocks.
+	:param tmpDir: The temporary directory.
+	:param output: The JSON file to write the metadata to. If None, the metadata is only returned.
+	:param jobs: The maximum number of ApamaDoc processes to run concurrently.
+	:param cacheDir: The directory of a persistent cache of the blocks of unchanged files.
+	:param builtinParser: Use the built-in EPL parser instead of ApamaDoc.
+	:param manifest: The InputManifest of the input directory, to document only its monitors. By default all the monitors in the input directory are documented.
+	:return: Tuple of the metadata object (None if there are no input files) and the messages extracted from it.
+	"""
+	if not builtinParser: confirmFullInstallation()
 	apama_home = os.getenv('APAMA_HOME', None)
 
 	inputDir = os.path.abspath(os.path.normpath(input))
 	if not os.path.isdir(inputDir): raise Exception('The input directory does not exist: %s' % inputDir)
 
+	scriptRunner = ScriptRunner(apama_home, output, inputDir, tmpDir, SCRIPT_VERSION, jobs, cacheDir, builtinParser, manifest)
+	return scriptRunner.generateBlockMetaData()
+
+def run_metadata_generator(input, output, tmpDir, printMsg=False, jobs=1, cacheDir=None, builtinParser=False, useServer=True):
 	output = os.path.normpath(output)
 	if not output.endswith('.json'):
 		output += '.json'
 
-	scriptRunner = ScriptRunner(apama_home, output, inputDir, tmpDir, '27.x.y')
-	f = scriptRunner.generateBlockMetaData()
+	# Use the build server if one is running
+	if useServer:
+		import buildServer
+		(served, f) = buildServer.request('build_metadata', input=os.path.abspath(input), output=os.path.abspath(output), tmpDir=os.path.abspath(tmpDir),
+			printMsg=printMsg, jobs=jobs, cacheDir=os.path.abspath(cacheDir) if cacheDir else None, builtinParser=builtinParser)
+		if served:
+			return tuple(f)
+
+	(metadata, messages) = generate_metadata(input, tmpDir, output, jobs, cacheDir, builtinParser)
+	f = (output if metadata is not None else None, messages)
 	if printMsg:
 		if f[0]:
 			print(f'Created {f[0]}')
@@ -964,7 +1275,10 @@ def run_metadata_generator(input, output, tmpDir, printMsg=False):
 
 
 def run(args):
-	return run_metadata_generator(args.input, args.output, args.tmpDir, printMsg=True)
+	profile = getattr(args, 'profile', None)
+	# A profiled generation is run locally, as the phases run by the build server are not measured in this process
+	with buildProfiler.profile(profile, 'build metadata'):
+		return run_metadata_generator(args.input, args.output, args.tmpDir, printMsg=True, jobs=args.jobs, cacheDir=args.cacheDir, builtinParser=args.builtinParser, useServer=not profile)
 
 ## Main method
 if __name__ == '__main__':
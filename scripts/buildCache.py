@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+import hashlib, json, os, shutil, tempfile
+from pathlib import Path
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+	"""
+	Compute the SHA-256 digest of the content of a file.
+	:param path: The file to hash.
+	:return: The hex digest.
+	"""
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+			h.update(chunk)
+	return h.hexdigest()
+
+class BuildCache(object):
+	"""
+	Persistent on-disk cache of build artifacts, keyed on content hashes.
+
+	Each entry is a directory <cacheDir>/<phase>/<key> holding the artifacts produced by one build phase. Entries are
+	published with an atomic rename, so an interrupted or concurrent build never sees a partially written entry. The
+	cache directory can be deleted at any time.
+	"""
+	def __init__(self, cacheDir):
+		self.cacheDir = Path(cacheDir).resolve()
+
+	def key(self, *parts):
+		"""
+		Compute a cache key.
+		:param parts: JSON-serializable values that identify the inputs of a phase.
+		:return: The hex digest to use as the key.
+		"""
+		return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('UTF8')).hexdigest()
+
+	def get(self, phase, key):
+		"""
+		Look up a cache entry.
+		:param phase: The name of the build phase.
+		:param key: The key of the entry.
+		:return: The directory of the entry, or None if it is not cached.
+		"""
+		entry = self.cacheDir / phase / key
+		return entry if entry.is_dir() else None
+
+	def put(self, phase, key, files):
+		"""
+		Store the artifacts of a build phase.
+		:param phase: The name of the build phase.
+		:param key: The key of the entry.
+		:param files: Dictionary of file name in the entry to either a source path or the bytes content of the file.
+		:return: The directory of the entry.
+		"""
+		phase_dir = self.cacheDir / phase
+		phase_dir.mkdir(parents=True, exist_ok=True)
+		staging = Path(tempfile.mkdtemp(prefix='.tmp-', dir=phase_dir))
+		try:
+			for (name, content) in files.items():
+				if isinstance(content, bytes):
+					(staging / name).write_bytes(content)
+				else:
+					shutil.copy2(content, staging / name)
+			try:
+				os.rename(staging, phase_dir / key)
+			except OSError:
+				pass # another build has published the same entry in the meantime
+		finally:
+			shutil.rmtree(staging, ignore_errors=True)
+		return phase_dir / key
+
+	def file_digests(self, files):
+		"""
+		Get the content hashes of files, only hashing the files whose stat info has changed since the cache last hashed them.
+		:param files: List of (path, stamp) tuples, the stamp being JSON-serializable stat info of the file.
+		:return: Dictionary of path to hex digest.
+		"""
+		table_file = self.cacheDir / 'digests.json'
+		try:
+			table = json.loads(table_file.read_text(encoding='UTF8'))
+		except (OSError, ValueError):
+			table = {}
+		digests = {}
+		changed = False
+		for (path, stamp) in files:
+			known = table.get(path)
+			if known and known[0] == stamp:
+				digests[path] = known[1]
+			else:
+				digests[path] = hash_file(path)
+				table[path] = [stamp, digests[path]]
+				changed = True
+		if changed:
+			self.cacheDir.mkdir(parents=True, exist_ok=True)
+			(fd, tmp) = tempfile.mkstemp(prefix='.tmp-', dir=self.cacheDir)
+			with os.fdopen(fd, 'w', encoding='UTF8') as f:
+				json.dump(table, f)
+			os.replace(tmp, table_file)
+		return digests
@@ -2,21 +2,39 @@
 
 # Copyright (c) 2019-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
 # Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
-import shutil, json, os, subprocess, urllib
-import blockMetadataGenerator
+import shutil, json, os, subprocess, urllib, io, contextlib, time, random, threading
+import concurrent.futures, zipfile
 from pathlib import Path
-import ssl, urllib.parse, urllib.request, base64, sys
+import ssl, urllib.parse, urllib.request, urllib.error, http.client, base64, sys
 from checkApamaInstallation import confirmFullInstallation
+from buildCache import BuildCache, hash_file
+from extensionManifest import InputManifest
+import buildProfiler
 
 ENCODING = 'UTF8'
 BLOCK_METADATA_EVENT = 'apama.analyticsbuilder.BlockMetadata'
 BLOCK_MESSAGES_EVENT = 'apama.analyticsbuilder.BlockMessages'
 PAS_EXT_TYPE = 'pas_extension'	# Type of the ManagedObject containing information about extension zip.
 PAS_EXT_ID_FIELD = 'pas_extension_binary_id' # The field of the ManagedObject with id of the extension zip binary object.
+PAS_EXT_DIGEST_FIELD = 'pas_extension_sha256' # The field of the ManagedObject with the SHA-256 digest of the uploaded extension zip.
 BLOCK_REGISTRY_CHANNEL = 'analyticsbuilder.metadata.requests'
 UNSUPPORTED_FILE_TYPES = ('.log','.classpath','.dependencies','.project','.deploy','.launch','.out','.o') # Files with these extensions are to be excluded
 EXCLUDE_FOLDERS = ['.git', '.github'] # The folders to be excluded, .git and .github folders should be excluded as they are unnecessary and can lead to build issues
 LOCALES = 'EN,DE,PL,PT_BR,ZH_CN,ZH_TW,NL,FR,JA_JP,KO,ES'
+WATCH_DEBOUNCE_SECS = 0.5 # Time without further changes after which the input is rebuilt in watch mode
+HTTP_TIMEOUT_SECS = 60 # Default timeout of the connection to Cumulocity and of each read from it
+MAX_REDIRECTS = 10
+HTTP_RETRIES = 3 # Number of times a failed request to Cumulocity is retried, if it is safe to retry it
+HTTP_RETRY_BACKOFF_SECS = 0.5 # Maximum delay before the first retry of a request, doubled for each further retry
+HTTP_RETRY_MAX_BACKOFF_SECS = 30
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504) # HTTP statuses of the failures which may not happen again
+CIRCUIT_BREAKER_FAILURES = 5 # Number of consecutive failed requests after which no more requests are sent for a while
+CIRCUIT_BREAKER_RESET_SECS = 30
+RESTART_TIMEOUT_SECS = 600 # Default time to wait for the apama-ctrl to be ready after requesting a restart
+RESTART_POLL_SECS = 1 # Interval between the checks whether the apama-ctrl is ready, doubled while it is down
+RESTART_POLL_MAX_SECS = 5
+RESTART_DOWN_GRACE_SECS = 60 # Time after which a restart which was never seen going down is assumed to be complete
+UPLOAD_CHUNK_SIZE = 1024 * 1024 # Size of the chunks in which an extension zip is read and sent when uploading it
 
 # Dictionary mapping parameter names to environment variables
 ENV_VAR_MAP = {
@@ -30,7 +48,12 @@ def add_arguments(parser):
 	parser.add_argument('--input', metavar='DIR', type=str, required=False, help='the input directory containing extension files - required when not deleting an extension')
 	parser.add_argument('--cdp', action='store_true', default=False, required=False, help='package all EPL files into a single CDP file')
 	parser.add_argument('--priority', metavar='N', type=int, required=False, help='the priority of the extension')
-	parser.add_argument('--folderToSkip', action='append', required=False, help='the list of folders to skip from building extension.')
+	parser.add_argument('--folderToSkip', action='append', required=False, help='the list of folders to skip from building extension, matched by name wherever they are in the input directory.')
+	parser.add_argument('--jobs', metavar='N', type=int, default=1, required=False, help='the maximum number of build steps to run concurrently, such as packaging the CDP file and generating the block metadata, and of the ApamaDoc and engine_package processes they run together (default 1)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help='the directory of a persistent build cache; build phases whose inputs are unchanged are reused from it')
+	parser.add_argument('--builtinParser', action='store_true', default=False, required=False, help='generate the block metadata with the built-in EPL parser instead of running ApamaDoc')
+	parser.add_argument('--profile', metavar='JSON_FILE', type=str, required=False, help='write the time taken by each phase of the build to a JSON file, in the Chrome trace event format')
+	parser.add_argument('--watch', action='store_true', default=False, required=False, help='keep running and rebuild the extension at --output whenever a file of the input directory changes')
 
 	local = parser.add_argument_group('local save (requires at least the following arguments: --input, and --output)')
 	local.add_argument('--output', metavar='ZIP_FILE', type=str, required=False, help='the output zip file (requires the --input argument)')
@@ -42,56 +65,133 @@ def add_arguments(parser):
 	remote.add_argument('--name', help='the extension name in the inventory')
 	remote.add_argument('--delete', action='store_true', default=False, help='delete the extension from the inventory')
 	remote.add_argument('--restart', action='store_true', default=False, help='restart the apama-ctrl after upload or delete operation')
+	remote.add_argument('--force', action='store_true', default=False, help='upload the extension, and restart the apama-ctrl if requested, even if the same extension is already in the inventory')
+	remote.add_argument('--wait', action='store_true', default=False, help='after restarting the apama-ctrl, wait until it is ready to use, and report the time it took')
+	remote.add_argument('--waitTimeout', metavar='SECS', type=float, default=RESTART_TIMEOUT_SECS, required=False, help=f'the maximum time to wait for the apama-ctrl to be ready after restarting it (default {RESTART_TIMEOUT_SECS})')
 	remote.add_argument('--ignoreVersion', action='store_true', default=False, required=False,
 						help='ignore the analytics builder script version check')
+	remote.add_argument('--timeout', metavar='SECS', type=float, default=HTTP_TIMEOUT_SECS, required=False,
+						help=f'the timeout in seconds of connecting to Cumulocity and of each read from it (default {HTTP_TIMEOUT_SECS})')
 
-def write_evt_file(ext_files_dir, name, event):
+def write_evt_events(ext_files_dir, name, events):
 	"""
-	Append event into the evt file of the extension.
+	Write the evt file of the extension with all its events at once, replacing any existing file.
 	:param ext_files_dir: The 'files' directory of the extension.
-	:param name: Name of the evt file
-	:param event: The event to append.
-	:return:
+	:param name: Name of the evt file.
+	:param events: The event strings. The file is removed if there are none.
+	:return: None
 	"""
 	events_dir = ext_files_dir / 'events'
+	if not events:
+		if os.path.exists(events_dir / name): os.remove(events_dir / name)
+		return
 	events_dir.mkdir(parents=True, exist_ok=True)
-	with open(events_dir / name, mode='a+', encoding='UTF8') as f:
-		return f.writelines(['\n' + event + '\n'])
+	with open(events_dir / name, mode='w', encoding='UTF8') as f:
+		f.write(evt_file_content(events))
 
 def embeddable_json_str(json_str):
 	"""Return JSON string which could be included in a string literal of an event string."""
-	s = json.dumps(json.loads(json_str), separators=(',', ':'))
-	return json.dumps(s)
-
-def get_messages_for_locale(locale, msg_files, localeMsgs, all_msgs, input, default=False):
-	"""Iterates over message files to assign to correct locale ready to be inserted in evt file."""
-	msg_to_files = {}
-	matches = []
-	for f in msg_files:
-		if not default and not f.match(f'{input}/{locale}/*'):
-			#This locale is not in the path for this message file.
-			continue
-		try:
-			matches.append(f)
-			data = json.loads(f.read_text(encoding=ENCODING))
-			if not isinstance(data, dict):
-				print(f'Skipping JSON file with invalid messages format: {str(f)}')
-				continue
-			for (k, v) in data.items():
-				if k in all_msgs:
-					print(f'Message {k} defined multiple times in "{msg_to_files[k]}" and "{f}".')
-				else:
-					all_msgs[k] = v
-					msg_to_files[k] = f
-		except:
-			print(f'Skipping invalid JSON file: {str(f)}')
-
-	#Can only match one locale, so remove any files that have been handled from the list.
-	for match in matches:
-		msg_files.remove(match)
-	if all_msgs:
-		#Store all messages for this locale.
-		localeMsgs[locale] = all_msgs
+	return embeddable_json(json.loads(json_str))
+
+def embeddable_json(obj, sort_keys=False):
+	"""
+	Return the compact JSON of an object as a string literal which could be included in an event string.
+	:param obj: The object to encode.
+	:param sort_keys: Sort the keys of the dictionaries, as done when the metadata JSON file is written.
+	:return: The escaped JSON string.
+	"""
+	return json.dumps(json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys))
+
+class MessageIndex(object):
+	"""
+	The messages of an extension by locale, from its messages.json and *-messages.json files.
+
+	The files in a <locale> directory directly under the input directory hold the messages of that locale, all the
+	other files hold the messages of the default locale (EN). The files are classified in a single pass and loaded
+	concurrently, and the messages of each locale are merged in the order of the files, the first definition of a
+	message winning.
+	"""
+	DEFAULT_LOCALE = 'EN'
+	MAX_LOAD_THREADS = 8
+
+	def __init__(self, input, msg_files, messages_from_metadata=None):
+		"""
+		:param input: The input directory.
+		:param msg_files: The messages JSON files, as Path objects.
+		:param messages_from_metadata: Extra messages of the default locale extracted from blocks' metadata, which take precedence over the files.
+		"""
+		locales = [l for l in LOCALES.split(',') if l != self.DEFAULT_LOCALE]
+		files_by_locale = {locale: [] for locale in locales + [self.DEFAULT_LOCALE]}
+		for f in msg_files:
+			locale = f.parent.name if f.parent.parent == input and f.parent.name in files_by_locale else self.DEFAULT_LOCALE
+			files_by_locale[locale].append(f)
+
+		loaded = self._load(msg_files)
+		self.messages = {}	# locale to messages, in the order of LOCALES with the default locale last
+		for (locale, files) in files_by_locale.items():
+			default = locale == self.DEFAULT_LOCALE
+			msgs = dict(messages_from_metadata or {}) if default else {}
+			msg_to_files = dict.fromkeys(msgs) # None for the messages from the metadata
+			for f in files:
+				data = loaded[f]
+				if data is None:
+					print(f'Skipping invalid JSON file: {str(f)}')
+					continue
+				if not isinstance(data, dict):
+					print(f'Skipping JSON file with invalid messages format: {str(f)}')
+					continue
+				for (k, v) in data.items():
+					if k in msgs:
+						print(f'Message {k} defined multiple times in ' + (f'"{msg_to_files[k]}"' if msg_to_files[k] else 'the block metadata') + f' and "{f}".')
+					else:
+						msgs[k] = v
+						msg_to_files[k] = f
+			if msgs:
+				self.messages[locale] = msgs
+
+	def _load(self, files):
+		""" Load the JSON files concurrently, returning a dictionary of file to content, None if it is not valid JSON. """
+		def load(f):
+			try:
+				return json.loads(f.read_text(encoding=ENCODING))
+			except (OSError, ValueError):
+				return None
+		if len(files) <= 1:
+			return {f: load(f) for f in files}
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.MAX_LOAD_THREADS, len(files))) as executor:
+			return dict(zip(files, executor.map(load, files)))
+
+	def events(self, name):
+		"""
+		:param name: Extension name.
+		:return: List of the event strings for sending the messages, one per locale.
+		"""
+		return [f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_MESSAGES_EVENT}("{name}", "{locale}", {embeddable_json(msgs)})'
+			for (locale, msgs) in self.messages.items()]
+
+def evt_file_content(events):
+	"""
+	Return the content of an evt file containing the specified events, as written by write_evt_events.
+	:param events: The event strings.
+	:return: The content of the evt file.
+	"""
+	return ''.join(['\n' + event + '\n' for event in events])
+
+def gen_messages_events(name, input, messages_from_metadata, msg_files=None):
+	"""
+	Generate the event strings for sending message JSON.
+	:param name: Extension name.
+	:param input: The input directory containing messages JSON files.
+	:param messages_from_metadata: Extra messages to include extracted from blocks' metadata.
+	:param msg_files: The messages.json and *-messages.json files of the input directory, found in it if not specified.
+	:return: List of event strings, one per locale.
+	"""
+	if msg_files is None:
+		msg_files = list(input.rglob('messages.json')) + list(input.rglob('*-messages.json'))
+	with buildProfiler.phase('message collation') as record:
+		record.add(sum(f.stat().st_size for f in msg_files), len(msg_files))
+		#Generated metadata from build extension is currently always EN.
+		return MessageIndex(input, msg_files, messages_from_metadata).events(name)
 
 def gen_messages_evt_file(name, input, ext_files_dir, messages_from_metadata):
 	"""
@@ -102,29 +202,8 @@ def gen_messages_evt_file(name, input, ext_files_dir, messages_from_metadata):
 	:param messages_from_metadata: Extra messages to include extracted from blocks' metadata.
 	:return: None
 	"""
-	msg_files = list(input.rglob('messages.json')) + list(input.rglob('*-messages.json'))
-	localeMsgs = {}
-	for locale in LOCALES.split(','):
-		if locale == 'EN':
-			#Skip the default in initial pass, all will be picked up in final pass.
-			continue
-		get_messages_for_locale(locale, msg_files, localeMsgs, {}, input)
-	
-	#All remaining files treated as default language EN.
-	locale = 'EN'
-	#Generated metadata from build extension is currently always EN.
-	all_msgs = messages_from_metadata.copy()
-	get_messages_for_locale(locale, msg_files, localeMsgs, all_msgs, input, default=True)
-
-	#Remove output file if already exists as we will be appending to it for each locale.
-	outFile = Path(ext_files_dir / 'events' / f'{name}_messages.evt')
-	if os.path.exists(outFile):
-		os.remove(outFile)
-
 	#Write all messages for each locale to evt file.
-	for (locale, msgs) in localeMsgs.items():
-		write_evt_file(ext_files_dir, f'{name}_messages.evt',
-		   f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_MESSAGES_EVENT}("{name}", "{locale}", {embeddable_json_str(json.dumps(msgs))})')
+	write_evt_events(ext_files_dir, f'{name}_messages.evt', gen_messages_events(name, input, messages_from_metadata))
 
 def createCDP(name, mons, ext_files_dir):
 	"""
@@ -141,11 +220,148 @@ def createCDP(name, mons, ext_files_dir):
 		'-o', os.path.join(ext_files_dir, name+'.cdp'),
 	] + [str(f) for f in mons]
 
-	subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE).check_returncode()
+	with buildProfiler.phase('CDP packaging') as record:
+		record.add(sum(os.path.getsize(f) for f in mons), len(mons))
+		subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE).check_returncode()
 
    
 
-def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=False,folderToSkip=None):
+class BuildPhase(object):
+	"""
+	A step of the extension build.
+	"""
+	def __init__(self, name, runner, depends_on=None):
+		"""
+		:param name: The name of the phase.
+		:param runner: The function to run. It is called with the results of the phases it depends on, in order.
+		:param depends_on: The names of the phases which must complete before this phase is run.
+		"""
+		self.name = name
+		self.runner = runner
+		self.depends_on = depends_on or []
+
+def run_phases(phases, jobs=1):
+	"""
+	Run build phases on a thread pool, starting each phase as soon as the phases it depends on have completed.
+	:param phases: The list of BuildPhase objects.
+	:param jobs: The maximum number of phases to run concurrently. Phases are run in order on the calling thread if 1.
+	:return: Dictionary of phase name to the result of the phase.
+	"""
+	results = {}
+	if jobs <= 1:
+		for phase in phases:
+			results[phase.name] = phase.runner(*[results[d] for d in phase.depends_on])
+		return results
+
+	pending = list(phases)
+	running = {}
+	with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+		while pending or running:
+			for phase in [p for p in pending if all(d in results for d in p.depends_on)]:
+				pending.remove(phase)
+				running[executor.submit(phase.runner, *[results[d] for d in phase.depends_on])] = phase
+			if not running:
+				raise Exception(f'Unsatisfiable dependencies for build phases: {", ".join(p.name for p in pending)}')
+			(done, _) = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				results[running.pop(future).name] = future.result()
+	return results
+
+class ExtensionZipWriter(object):
+	"""
+	Writer for the extension zip file.
+
+	Input files and the CDP are streamed from disk straight into the zip, and the small generated event files are written
+	from memory.
+	All the entries have a fixed timestamp, and their permissions only depend on whether the file is executable, so
+	rebuilding unchanged sources produces the same zip, even from a fresh checkout where the modification times of the
+	files or the umask differ.
+	"""
+	GENERATED_DATE_TIME = (1980, 1, 1, 0, 0, 0) # The earliest date a zip entry can have.
+	FORMAT = 3 # Changed whenever the same sources produce a different zip, so that cached zips are not reused
+
+	def __init__(self, path):
+		self.zf = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+		self.dirs = set()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		self.close()
+
+	def close(self):
+		self.zf.close()
+
+	def _add_parent_dirs(self, arcname):
+		parts = arcname.split('/')[:-1]
+		for i in range(1, len(parts) + 1):
+			dir_name = '/'.join(parts[:i]) + '/'
+			if dir_name not in self.dirs:
+				self.dirs.add(dir_name)
+				zinfo = zipfile.ZipInfo(dir_name, self.GENERATED_DATE_TIME)
+				zinfo.external_attr = (0o40755 << 16) | 0x10 # unix directory mode and the MS-DOS directory flag
+				self.zf.writestr(zinfo, b'')
+
+	def add_file(self, arcname, path):
+		"""
+		Stream a file into the zip, keeping it executable if it is executable.
+		:param arcname: The name of the entry in the zip.
+		:param path: The file to add.
+		"""
+		self._add_parent_dirs(arcname)
+		zinfo = zipfile.ZipInfo(arcname, self.GENERATED_DATE_TIME)
+		zinfo.external_attr = (0o755 if os.stat(path).st_mode & 0o111 else 0o644) << 16
+		zinfo.compress_type = zipfile.ZIP_DEFLATED
+		zinfo.file_size = os.path.getsize(path) # so that large files are written in the zip64 format
+		with open(path, 'rb') as src, self.zf.open(zinfo, 'w') as dst:
+			shutil.copyfileobj(src, dst)
+
+	def add_bytes(self, arcname, content):
+		"""
+		Write a generated artifact into the zip.
+		:param arcname: The name of the entry in the zip.
+		:param content: The bytes content of the entry.
+		"""
+		self._add_parent_dirs(arcname)
+		zinfo = zipfile.ZipInfo(arcname, self.GENERATED_DATE_TIME)
+		zinfo.external_attr = 0o644 << 16
+		zinfo.compress_type = zipfile.ZIP_DEFLATED
+		self.zf.writestr(zinfo, content)
+
+def build_cache_keys(cache, name, manifest, mons, files_to_copy, cdp, priority, builtinParser=False):
+	"""
+	Compute the cache keys of the build phases from the content hashes of the input files, relative to the input
+	directory so that a cache is shared by checkouts in different directories, and of the Apama tools which build them.
+	:param cache: The BuildCache object.
+	:param name: Extension name.
+	:param manifest: The InputManifest of the input directory. Only the files whose stat info has changed since the
+	cache last saw them are hashed.
+	:param mons: The mon files to package into a CDP file.
+	:param files_to_copy: The files to copy into the extension.
+	:param cdp: Package all monitors into a CDP file.
+	:param priority: The priority of the package.
+	:param builtinParser: Generate the block metadata with the built-in EPL parser.
+	:return: Dictionary of phase name to key. The key of the 'messages' phase is a function of the messages extracted from the block metadata.
+	"""
+	import blockMetadataGenerator	# imported when needed, to keep the start of the other commands fast
+	manifest.useDigests(cache)
+	file_digest = manifest.digest
+	def digest(files):
+		return sorted((os.path.relpath(f, manifest.input), file_digest(f)) for f in files)
+
+	version = blockMetadataGenerator.SCRIPT_VERSION
+	apama = blockMetadataGenerator.apama_version(cache)
+	keys = {
+		'cdp': cache.key('cdp', version, apama, digest(mons)) if cdp else None,
+		'metadata': cache.key('metadata', version, name, blockMetadataGenerator.parser_version(builtinParser), None if builtinParser else apama, digest(manifest.mons())),
+	}
+	msg_files_digest = digest([os.fspath(f) for f in manifest.messageFiles()])
+	keys['messages'] = lambda messages: cache.key('messages', version, name, messages, msg_files_digest)
+	keys['extension'] = cache.key('extension', version, ExtensionZipWriter.FORMAT, name, priority, keys['cdp'], keys['metadata'], msg_files_digest, digest(files_to_copy))
+	return keys
+
+def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=False,folderToSkip=None, cacheDir=None, jobs=1, builtinParser=False):
 	"""
 	Build an extension from specified input directory.
 	:param input: The input directory containing artifacts for the extension.
@@ -155,8 +371,12 @@ def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=Fa
 	:param priority: The priority of the package.
 	:param printMsg: Print success message with location of the extension zip.
 	:param folderToSkip: The list of directories to skip from build.
+	:param cacheDir: The directory of a persistent build cache. Build phases whose inputs are unchanged are reused from it.
+	:param jobs: The maximum number of build phases to run concurrently.
+	:param builtinParser: Generate the block metadata with the built-in EPL parser instead of ApamaDoc.
 	:return:
 	"""
+	import blockMetadataGenerator
 	input = Path(input).resolve()
 	output = Path(output).resolve()
 	tmpDir = Path(tmpDir).resolve()
@@ -172,81 +392,313 @@ def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=Fa
 		output = output.with_name(name)
 
 	ext_dir = tmpDir / name				# '/' operator on Path object joins them
-	ext_files_dir = ext_dir / 'files'
-	ext_files_dir.mkdir(parents=True, exist_ok=True)
-
-	# Define priority of the extension if specified
-	if priority is not None:
-		ext_dir.joinpath('priority.txt').write_text(str(priority), encoding=ENCODING)
+	ext_dir.mkdir(parents=True, exist_ok=True)
 	
-	files_to_copy = []	
+	# Scan the input folder once, all the build phases use the same files
+	# Excluded dirs are not traversed, which saves time and works if a dir is inaccessible
+	with buildProfiler.phase('tree walk') as record:
+		manifest = InputManifest.scan(input, set(folderToSkip + EXCLUDE_FOLDERS), UNSUPPORTED_FILE_TYPES)
+		record.add(items=len(manifest.files))
+	for folder in manifest.unmatchedFolders(folderToSkip):
+		print(f'WARNING: No folder named {folder} to skip in the input directory {input}' +
+			(', the folders to skip are matched by name, not by path' if '/' in folder or os.sep in folder else ''), file=sys.stderr)
+	files_to_copy = manifest.paths()
 	mons = []
+	if cdp: # Create CPD or copy mon files to extension directory while maintaining structure
+		mons = manifest.mons()
+		files_to_copy = [f for f in files_to_copy if not f.endswith('.mon')]
 
-	# Traverse the input folder 
-	exclude = set (folderToSkip + EXCLUDE_FOLDERS)
-	for root, dirs, filenames in os.walk(input, topdown=True): 
-		dirs[:] = [d for d in dirs if d not in exclude] # exclude dir before they are traversed, saves time and works if dir is inaccessible
-		for filename in filenames:
-			if not filename.endswith(UNSUPPORTED_FILE_TYPES ):# Excluding UNSUPPORTED_FILE_TYPES from all_files
-				if filename.endswith('.mon') and cdp: # Create CPD or copy mon files to extension directory while maintaining structure
-					mons.append(os.path.join(root, filename))
-				else: files_to_copy.append (os.path.join(root, filename))
-	
-	if cdp : createCDP(name, mons, ext_files_dir)
-			
-	for p in files_to_copy:
-		target_file = ext_files_dir /  Path(p).relative_to(input)
-		target_file.parent.mkdir(parents=True, exist_ok=True)
-		shutil.copy2(p, target_file)
-
-	# Generate block metadata
-	metadata_tmp_dir = tmpDir / 'metadata'
-	(metadata_json_file, messages) = blockMetadataGenerator.run_metadata_generator(input, str(metadata_tmp_dir / name), str(metadata_tmp_dir))
-
-	if metadata_json_file:
-		# Write evt file for metadata events
-		metadata = Path(metadata_json_file).read_text(encoding=ENCODING)
-		write_evt_file(ext_files_dir, f'{name}_metadata.evt', f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_METADATA_EVENT}("{name}", "EN", {embeddable_json_str(metadata)})')
-
-	# Collate all the messages from the messages.json and *-messages.json
-	gen_messages_evt_file(name, input, ext_files_dir, messages)
-
-	# Create zip of extension
-	shutil.make_archive(output, format='zip', root_dir=ext_dir)
+	cache = BuildCache(cacheDir) if cacheDir else None
+	keys = {}
+	if cache:
+		with buildProfiler.phase('cache keys'):
+			keys = build_cache_keys(cache, name, manifest, mons, files_to_copy, cdp, priority, builtinParser)
+	entry = cache.get('extension', keys['extension']) if cache else None
+	if entry:
+		# Nothing has changed since the cached build, reuse its zip as is
+		shutil.copy2(entry / 'extension.zip', f'{output}.zip.part')
+		os.replace(f'{output}.zip.part', f'{output}.zip')
+		if printMsg:
+			print(f'Created {output}.zip')
+		return output.absolute().with_suffix('.zip')
+
+	def package_cdp():
+		entry = cache.get('cdp', keys['cdp']) if cache else None
+		if entry:
+			return entry / 'extension.cdp'
+		createCDP(name, mons, ext_dir)
+		if cache: cache.put('cdp', keys['cdp'], {'extension.cdp': ext_dir / (name + '.cdp')})
+		return ext_dir / (name + '.cdp')
+
+	def generate_metadata():
+		entry = cache.get('metadata', keys['metadata']) if cache else None
+		if entry:
+			metadata_evt = (entry / 'metadata.evt').read_bytes() if (entry / 'metadata.evt').exists() else None
+			return (metadata_evt, json.loads((entry / 'messages.json').read_text(encoding=ENCODING)))
+
+		# engine_package runs concurrently with the ApamaDoc processes if the phases are run concurrently, leave it one of the jobs
+		metadataJobs = jobs - 1 if cdp and jobs > 1 else jobs
+		with buildProfiler.phase('block metadata'):
+			(metadata, messages) = blockMetadataGenerator.generate_metadata(input, str(tmpDir / 'metadata'), jobs=metadataJobs, cacheDir=cacheDir, builtinParser=builtinParser, manifest=manifest)
+
+		metadata_evt = None
+		if metadata is not None:
+			# Generate evt file for metadata events
+			metadata_evt = bytes(evt_file_content([f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_METADATA_EVENT}("{name}", "EN", {embeddable_json(metadata, sort_keys=True)})']), encoding=ENCODING)
+		if cache:
+			cached = {'messages.json': bytes(json.dumps(messages), encoding=ENCODING)}
+			if metadata_evt: cached['metadata.evt'] = metadata_evt
+			cache.put('metadata', keys['metadata'], cached)
+		return (metadata_evt, messages)
+
+	def collate_messages(metadata):
+		(_, messages) = metadata
+		entry = cache.get('messages', keys['messages'](messages)) if cache else None
+		if entry:
+			return (entry / 'messages.evt').read_bytes() if (entry / 'messages.evt').exists() else None
+		events = gen_messages_events(name, input, messages, manifest.messageFiles())
+		messages_evt = bytes(evt_file_content(events), encoding=ENCODING) if events else None
+		if cache:
+			cache.put('messages', keys['messages'](messages), {'messages.evt': messages_evt} if messages_evt else {})
+		return messages_evt
+
+	zip_file = Path(f'{output}.zip')
+	zip_part_file = Path(f'{output}.zip.part')
+	try:
+		with ExtensionZipWriter(zip_part_file) as zf:
+			def write_sources():
+				with buildProfiler.phase('file copy') as record:
+					for p in sorted(files_to_copy):
+						zf.add_file('files/' + Path(p).relative_to(input).as_posix(), p)
+						record.add(os.path.getsize(p), 1)
+
+			# The phases only share the messages extracted from the block metadata, everything else can run concurrently
+			phases = [
+				BuildPhase('cdp', package_cdp) if cdp else None,
+				# Stream the input files into the zip while the generated artifacts are being built
+				BuildPhase('sources', write_sources),
+				BuildPhase('metadata', generate_metadata),
+				# Collate all the messages from the messages.json and *-messages.json
+				BuildPhase('messages', collate_messages, ['metadata']),
+			]
+			results = run_phases([p for p in phases if p], jobs)
+
+			with buildProfiler.phase('zip') as record:
+				# Define priority of the extension if specified
+				if priority is not None:
+					zf.add_bytes('priority.txt', bytes(str(priority), encoding=ENCODING))
+				if cdp:
+					zf.add_file(f'files/{name}.cdp', results['cdp'])
+				if results['metadata'][0]:
+					zf.add_bytes(f'files/events/{name}_metadata.evt', results['metadata'][0])
+				if results['messages']:
+					zf.add_bytes(f'files/events/{name}_messages.evt', results['messages'])
+				zf.close()
+				record.add(zip_part_file.stat().st_size)
+		os.replace(zip_part_file, zip_file)
+	finally:
+		if zip_part_file.exists(): zip_part_file.unlink()
+
+	if cache:
+		cache.put('extension', keys['extension'], {'extension.zip': zip_file})
 	if printMsg:
 		print(f'Created {output}.zip')
 	return output.absolute().with_suffix('.zip')
 
+class CircuitOpenError(urllib.error.URLError):
+	""" Raised instead of sending a request to a server which has failed too many requests in a row. """
+
+def is_transient_error(ex):
+	"""
+	:return: True if the failure of a request may not happen again, that is a connection failure or a server error, for
+	the exception or any exception it was raised while handling.
+	"""
+	while ex is not None:
+		if isinstance(ex, CircuitOpenError):
+			return False
+		if isinstance(ex, urllib.error.HTTPError):
+			return ex.code in HTTP_RETRY_STATUSES
+		if isinstance(ex, (urllib.error.URLError, ConnectionError, TimeoutError)):
+			return True
+		ex = ex.__cause__ or ex.__context__
+	return False
+
+class CircuitBreaker(object):
+	"""
+	Circuit breaker stopping the requests to a server after too many failures in a row, so that a server which is down
+	is not sent more requests and retries. Once the reset time has elapsed, requests are sent again, and the circuit
+	opens again as soon as one fails.
+	"""
+	def __init__(self, failures=CIRCUIT_BREAKER_FAILURES, reset=CIRCUIT_BREAKER_RESET_SECS):
+		"""
+		:param failures: The number of consecutive failures which open the circuit.
+		:param reset: The time in seconds for which the circuit stays open.
+		"""
+		self.threshold = failures
+		self.reset = reset
+		self.failures = 0
+		self.opened = None
+		self.lock = threading.Lock()
+
+	def check(self, url):
+		""" Raise a CircuitOpenError if no request is to be sent. """
+		with self.lock:
+			if self.opened is not None and time.monotonic() - self.opened < self.reset:
+				raise CircuitOpenError(f'not sending a request to {url}, as the last {self.failures} requests failed; retrying in {self.reset - (time.monotonic() - self.opened):.0f}s')
+
+	def record(self, succeeded):
+		""" Record the outcome of a request, a response of the server other than a server error being a success. """
+		with self.lock:
+			if succeeded:
+				(self.failures, self.opened) = (0, None)
+			else:
+				self.failures += 1
+				if self.failures >= self.threshold:
+					self.opened = time.monotonic()
+
 class C8yConnection(object):
 	"""
 	Simple object to create connection to Cumulocity and perform REST requests.
+
+	The requests share a persistent HTTP/1.1 connection to each host, which is reconnected if the server has closed it
+	since the previous request. Use close(), or the object as a context manager, to close the connections.
+
+	Requests which fail with a connection failure or a server error are retried after an exponential backoff with
+	jitter, if they can be retried safely (see request()), and a circuit breaker stops sending requests after too many
+	failures in a row.
 	"""
-	def __init__(self, url, username, password):
+	def __init__(self, url, username, password, timeout=HTTP_TIMEOUT_SECS, retries=HTTP_RETRIES, backoff=HTTP_RETRY_BACKOFF_SECS, circuitBreaker=True):
+		"""
+		:param url: The base Cumulocity URL.
+		:param username: The username.
+		:param password: The password.
+		:param timeout: The timeout in seconds of connecting and of each read from the connection, None for no timeout.
+		:param retries: The maximum number of times a failed request is retried.
+		:param backoff: The maximum delay in seconds before the first retry, doubled for each further retry.
+		:param circuitBreaker: Stop sending requests after too many failures in a row.
+		"""
 		if not (url.startswith('http://') or url.startswith('https://')):
 			url = 'https://' + url
-		auth_handler = urllib.request.HTTPBasicAuthHandler()
-		auth_handler.add_password(realm='Name of Your Realm',
-								  uri=url,
-								  user=username,
-								  passwd=password)
-		auth_handler.add_password(realm='Cumulocity',
-								  uri=url,
-								  user=username,
-								  passwd=password)
 		ctx = ssl.create_default_context()
 		ctx.check_hostname = False
 		ctx.verify_mode = ssl.CERT_NONE
-		self.urlopener = urllib.request.build_opener(urllib.request.HTTPSHandler(context=ctx), auth_handler)
+		self.ssl_context = ctx
+		self.timeout = timeout
+		self.retries = retries
+		self.backoff = backoff
+		self.breaker = CircuitBreaker() if circuitBreaker else None
+		self.credentials = (username, password)
+		self.connections = {}	# (scheme, host and port) to the HTTPConnection to it
+		self.proxies = urllib.request.getproxies()	# as urllib, from the HTTPS_PROXY, HTTP_PROXY and NO_PROXY environment variables
 		self.base_url = url
 		self.auth_header = "Basic " + base64.b64encode(bytes("%s:%s" % (username, password), "utf8")).decode()
 
-	def request(self, method, path, body=None, headers=None):
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		self.close()
+
+	def polling_connection(self, timeout=RESTART_POLL_MAX_SECS):
+		"""
+		:return: A new connection to the same Cumulocity, which neither retries requests nor has a circuit breaker, for
+		polling a service which is expected to be down at times.
+		"""
+		return C8yConnection(self.base_url, *self.credentials, timeout=min(timeout, self.timeout or timeout), retries=0, circuitBreaker=False)
+
+	def close(self):
+		""" Close the connections. """
+		for conn in self.connections.values():
+			conn.close()
+		self.connections.clear()
+
+	def _proxy(self, scheme, netloc):
+		"""
+		:return: Tuple of the host and port of the proxy to connect to a host through, and the Proxy-Authorization header
+		for it (None if the proxy has no credentials), or None to connect to the host directly.
+		"""
+		proxy = self.proxies.get(scheme)
+		if not proxy or urllib.request.proxy_bypass(netloc):
+			return None
+		if '://' not in proxy:
+			proxy = 'http://' + proxy
+		parts = urllib.parse.urlsplit(proxy)
+		authorization = None
+		if parts.username is not None:
+			credentials = f'{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or "")}'
+			authorization = "Basic " + base64.b64encode(bytes(credentials, "utf8")).decode()
+		return (parts.netloc.rpartition('@')[2], authorization)
+
+	def _connection(self, scheme, netloc):
+		"""
+		:return: Tuple of the connection to a host, whether it has been used by an earlier request, and the proxy (see
+		_proxy()) if the connection is to an HTTP proxy, which is sent the absolute URL of the requests, otherwise None.
+		"""
+		proxy = self._proxy(scheme, netloc)
+		conn = self.connections.get((scheme, netloc))
+		if conn is not None and conn.sock is not None:
+			return (conn, True, proxy if scheme == 'http' else None)
+		if conn is None:
+			host = proxy[0] if proxy else netloc
+			if scheme == 'https':
+				conn = http.client.HTTPSConnection(host, timeout=self.timeout, context=self.ssl_context)
+				if proxy:
+					# Tunnel through the proxy, which only sees the host the connection is to
+					conn.set_tunnel(netloc, headers={'Proxy-Authorization': proxy[1]} if proxy[1] else None)
+			else:
+				conn = http.client.HTTPConnection(host, timeout=self.timeout)
+			self.connections[(scheme, netloc)] = conn
+		return (conn, False, proxy if scheme == 'http' else None)
+
+	def _send(self, method, url, body, headers, resend=True):
+		"""
+		Send a request on the persistent connection to the host of the URL, and read the response. If the connection
+		was reused and the server had closed it, the request is sent again on a new connection.
+		:param resend: Whether the request can be sent again if the connection was closed, as the server may have closed
+		it after performing the request. If not, the failure is raised.
+		:return: Tuple of the response and its body.
+		"""
+		parts = urllib.parse.urlsplit(url)
+		if parts.scheme not in ('http', 'https'):
+			raise urllib.error.URLError(f'unknown url type: {parts.scheme}')
+		target = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+		while True:
+			(conn, reused, proxy) = self._connection(parts.scheme, parts.netloc)
+			try:
+				if proxy:
+					conn.request(method, urllib.parse.urlunsplit(parts._replace(fragment='')), body,
+						dict(headers, **{'Proxy-Authorization': proxy[1]}) if proxy[1] else headers)
+				else:
+					conn.request(method, target, body, headers)
+				resp = conn.getresponse()
+				return (resp, resp.read())
+			except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as ex:
+				conn.close()
+				if not (reused and resend):
+					raise urllib.error.URLError(ex)
+			except (OSError, http.client.HTTPException) as ex:
+				conn.close()
+				raise urllib.error.URLError(ex)
+			except BaseException:
+				conn.close()	# the request may have been partially sent
+				raise
+
+	def request(self, method, path, body=None, headers=None, retry=None, retry_guard=None):
 		"""
 		Perform an HTTP request. In case of POST request, return the id of the created resource.
+
+		Redirects are followed as by urllib, and unsuccessful responses are raised as urllib.error.HTTPError.
+
+		Requests failing with a connection failure or a server error are retried if the method is idempotent (GET, HEAD,
+		PUT and DELETE, a DELETE being successful if the resource is not found when it is retried). Other requests,
+		which may have taken effect even though they failed, are only retried if they have a retry_guard.
 		:param method: The method.
 		:param path: The path of the resource.
-		:param body: The body for the request.
+		:param body: The body for the request. Its content is sent again when the request is retried.
 		:param headers: The headers for the request.
+		:param retry: Whether the request may be retried, by default if the method is idempotent.
+		:param retry_guard: For a request which is not idempotent, function called before retrying it, which returns the
+		result of the request if it has taken effect after all (such as the id of the created resource), otherwise None.
 		:return: Body of the response. In case of POST request, id of the resource specified by the Location header.
 		"""
 		headers = headers or {}
@@ -254,10 +706,58 @@ class C8yConnection(object):
 		if isinstance(body, str):
 			body = bytes(body, encoding=ENCODING)
 		url = self.base_url[:-1] if self.base_url.endswith('/') else self.base_url
-		req = urllib.request.Request(url + path, data=body, headers=headers, method=method)
-		resp = self.urlopener.open(req)
+		url = url + path
+		if retry is None:
+			retry = method in ('GET', 'HEAD', 'PUT', 'DELETE') or retry_guard is not None
+		for attempt in range(self.retries + 1):
+			if self.breaker: self.breaker.check(url)
+			try:
+				# Only resend at once requests with the same response when they are performed twice
+				result = self._request(method, path, url, body, headers, resend=retry and retry_guard is None and method != 'DELETE')
+			except Exception as ex:
+				transient = is_transient_error(ex)
+				if self.breaker: self.breaker.record(not transient)
+				if attempt > 0 and method == 'DELETE' and isinstance(ex, urllib.error.HTTPError) and ex.code == 404:
+					return b'' # deleted by an earlier attempt
+				if not (transient and retry) or attempt == self.retries:
+					raise
+				time.sleep(self._retry_delay(attempt, ex))
+				if retry_guard is not None:
+					result = retry_guard()
+					if result is not None:
+						return result
+				continue
+			if self.breaker: self.breaker.record(True)
+			return result
+
+	def _retry_delay(self, attempt, ex):
+		"""
+		:return: The delay in seconds before retrying a failed request, randomly up to the exponential backoff for the
+		attempt (full jitter), or as requested by the Retry-After header of the response.
+		"""
+		retry_after = ex.headers.get('Retry-After') if isinstance(ex, urllib.error.HTTPError) and ex.headers else None
+		if retry_after and retry_after.strip().isdigit():
+			return min(int(retry_after), HTTP_RETRY_MAX_BACKOFF_SECS)
+		return random.uniform(0, min(self.backoff * 2 ** attempt, HTTP_RETRY_MAX_BACKOFF_SECS))
+
+	def _request(self, method, path, url, body, headers, resend):
+		""" Perform an HTTP request once, following redirects, see request() and _send(). """
+		for redirects in range(MAX_REDIRECTS + 1):
+			(resp, content) = self._send(method, url, body, headers, resend)
+			location = resp.getheader('Location')
+			if resp.status not in (301, 302, 303, 307, 308) or not location or redirects == MAX_REDIRECTS:
+				break
+			if not (method in ('GET', 'HEAD') or (resp.status in (301, 302, 303) and method == 'POST')):
+				break
+			url = urllib.parse.urljoin(url, location)
+			if method == 'POST':
+				# As urllib does, a POST request is redirected as a GET request without its body
+				(method, body) = ('GET', None)
+				headers = {k: v for (k, v) in headers.items() if k.lower() not in ('content-type', 'content-length', 'content')}
+		if not 200 <= resp.status < 300:
+			raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.msg, io.BytesIO(content))
 		if resp.getheader('Content-Type', '') == 'text/html': # we never ask for HTML, if we got it, this is probably the wrong URL (or we're very confused)
-			raise urllib.error.HTTPError(url, 404, resp.getheaders(), f'Failed to perform REST request for resource {path} on url {self.base_url}. Verify that the base Cumulocity URL is correct.', None)
+			raise urllib.error.HTTPError(url, 404, f'Failed to perform REST request for resource {path} on url {self.base_url}. Verify that the base Cumulocity URL is correct.', resp.msg, None)
 
 
 		# return the object id if POST
@@ -265,7 +765,7 @@ class C8yConnection(object):
 			loc = resp.getheader('Location', None)
 			if loc.endswith('/'): loc = loc[:-1]
 			return loc.split('/')[-1]
-		return resp.read()
+		return content
 
 	def do_get(self, path, params=None, headers=None, jsonResp=True):
 		"""
@@ -297,13 +797,45 @@ class C8yConnection(object):
 		body = json.dumps(body)
 		return self.request(method, path, body, headers)
 
+class UploadBody(object):
+	"""
+	Body of a request uploading a file, which is streamed from the file in chunks, between a preamble and a trailer, so
+	that the file is never read into memory as a whole. It is sent again from the start if the request is retried.
+	"""
+	def __init__(self, path, preamble=b'', trailer=b''):
+		"""
+		:param path: The file to upload.
+		:param preamble: The bytes to send before the content of the file.
+		:param trailer: The bytes to send after the content of the file.
+		"""
+		self.path = path
+		self.preamble = preamble
+		self.trailer = trailer
+		self.file_size = os.path.getsize(path)
+
+	def content_length(self):
+		""" :return: The total size of the body in bytes, for the Content-Length header. """
+		return len(self.preamble) + self.file_size + len(self.trailer)
+
+	def __iter__(self):
+		yield self.preamble
+		sent = 0
+		with open(self.path, 'rb') as f:
+			while chunk := f.read(UPLOAD_CHUNK_SIZE):
+				sent += len(chunk)
+				yield chunk
+		if sent != self.file_size:
+			raise Exception(f'{self.path} changed size while being uploaded')
+		yield self.trailer
+
 def upload_new_extension(connection, f, extension_name):
 	"""
-	Create multi-form payload and header for REST request to upload the specified file.
+	Create multi-form payload and header for REST request to upload the specified file. The file is streamed rather
+	than read into memory.
 	:param connection: Object to perform REST requests.
 	:param f: The file to upload.
 	:param extension_name: Name of the extension to create.
-	:return: None
+	:return: The id of the created managed object.
 	"""
 	formBoundary = '----PASExtension3XtDFfhJ8XLIrkPw'
 	headers = {
@@ -311,38 +843,57 @@ def upload_new_extension(connection, f, extension_name):
 		'Content-Type': f'multipart/form-data; boundary={formBoundary}',
 		'Content': 'multipart/form-data'
 	}
-	file_content = Path(f).read_bytes()
+	body = UploadBody(f)
 	formBoundary = '--' + formBoundary
 	filename = extension_name + '.zip'
-	body = bytearray('%s\r\nContent-Disposition: form-data; name="object"\r\n\r\n{"name":"%s","type":"application/zip","pas_extension":"%s"}\r\n' % (formBoundary, filename, extension_name), encoding=ENCODING)
-	body += bytearray('%s\r\nContent-Disposition: form-data; name="filesize"\r\n\r\n%s\r\n' % (formBoundary, len(file_content)), encoding=ENCODING)
-	body += bytearray('%s\r\nContent-Disposition: form-data; name="file"; filename="%s"\r\nContent-Type: application/zip\r\n\r\n' % (formBoundary, filename), encoding=ENCODING)
-	body += file_content
-	body += bytearray(f'\r\n{formBoundary}--', encoding=ENCODING)
+	preamble = bytearray('%s\r\nContent-Disposition: form-data; name="object"\r\n\r\n{"name":"%s","type":"application/zip","pas_extension":"%s"}\r\n' % (formBoundary, filename, extension_name), encoding=ENCODING)
+	preamble += bytearray('%s\r\nContent-Disposition: form-data; name="filesize"\r\n\r\n%s\r\n' % (formBoundary, body.file_size), encoding=ENCODING)
+	preamble += bytearray('%s\r\nContent-Disposition: form-data; name="file"; filename="%s"\r\nContent-Type: application/zip\r\n\r\n' % (formBoundary, filename), encoding=ENCODING)
+	body.preamble = bytes(preamble)
+	body.trailer = bytes(f'\r\n{formBoundary}--', encoding=ENCODING)
+	headers['Content-Length'] = str(body.content_length())
+	def uploaded_extension_id():
+		# The failed upload may have created the extension after all, in which case it must not be uploaded again
+		extension_mo = get_extension_mo(connection, extension_name)
+		return extension_mo['id'] if extension_mo else None
 	try:
-		connection.request('POST', '/inventory/binaries', body, headers)
+		return connection.request('POST', '/inventory/binaries', body, headers, retry_guard=uploaded_extension_id)
 	except Exception as ex:
 		raise Exception(f'Unable to upload extension using POST on /inventory/binaries: {ex}')
 
 def replace_extension_content(connection, f, moId):
 	"""
-	Replace content of existing extension.
+	Replace content of existing extension. The file is streamed rather than read into memory.
 	:param connection: Object to perform REST requests.
 	:param f: The zip file.
 	:param moId: The id of the extension object.
 	:return: None
 	"""
-	file_content = Path(f).read_bytes()
+	body = UploadBody(f)
 	headers = {
 		'Accept': '*/*',
 		'Content-Type': f'application/zip',
+		'Content-Length': str(body.content_length()),
 	}
 	try:
-		connection.request('PUT', f'/inventory/binaries/{moId}', file_content, headers)
+		connection.request('PUT', f'/inventory/binaries/{moId}', body, headers)
 	except Exception as ex:
 		raise Exception(f'Unable to replace extension content using PUT on /inventory/binaries/{moId}: {ex}')
 
-def upload_or_delete_extension(extension_zip, url, username, password, name, delete=False, restart=False, ignoreVersion=False, printMsg=False):
+def record_extension_digest(connection, moId, digest):
+	"""
+	Record the digest of the uploaded extension zip on its managed object, so that uploading the same zip again can be skipped.
+	:param connection: Object to perform REST requests.
+	:param moId: The id of the extension object.
+	:param digest: The SHA-256 hex digest of the zip.
+	:return: None
+	"""
+	try:
+		connection.do_request_json('PUT', f'/inventory/managedObjects/{moId}', {PAS_EXT_DIGEST_FIELD: digest})
+	except Exception as ex:
+		raise Exception(f'Uploaded the extension but unable to record its digest using PUT on /inventory/managedObjects/{moId}, use --force for the next upload: {ex}')
+
+def upload_or_delete_extension(extension_zip, url, username, password, name, delete=False, restart=False, ignoreVersion=False, printMsg=False, timeout=HTTP_TIMEOUT_SECS, force=False, waitTimeout=None):
 	"""
 	Upload the extension to the Cumulocity inventory or delete the extension from the inventory.
 	:param extension_zip: The extension zip to upload.
@@ -354,15 +905,21 @@ def upload_or_delete_extension(extension_zip, url, username, password, name, del
 	:param restart: Restart the apama-ctrl after uploading the extension.
 	:param ignoreVersion: Ignores block sdk version.
 	:param printMsg: Print the success message.
+	:param timeout: The timeout in seconds of the connection to Cumulocity.
+	:param force: Upload the extension and restart even if the extension in the inventory has the same digest.
+	:param waitTimeout: After restarting, wait up to this number of seconds for the apama-ctrl to be ready, None not to wait.
 	:return:
 	"""
-	connection = C8yConnection(url, username, password)
-	
-	# checks Analytics builder version with Apama-ctrl version
-	checkVersions(connection, ignoreVersion)
-	checkIfExtensionsSupported(connection, ignoreVersion)
-		
-	# Get existing ManagedObject for PAS extension.
+	with C8yConnection(url, username, password, timeout) as connection:
+		upload_or_delete(connection, extension_zip, name, delete, restart, ignoreVersion, printMsg, force, waitTimeout)
+
+def get_extension_mo(connection, name):
+	"""
+	Get the existing ManagedObject for PAS extension.
+	:param connection: Object to perform REST requests.
+	:param name: The name of the extension.
+	:return: The managed object, None if there is no extension with this name.
+	"""
 	try:
 		extension_mos = connection.do_get('/inventory/managedObjects', {'query': f"pas_extension eq '{name}'"})
 	except urllib.error.HTTPError as err:
@@ -377,34 +934,157 @@ def upload_or_delete_extension(extension_zip, url, username, password, name, del
 		extension_mo = extension_mos[0] if len(extension_mos) == 1 else None
 		if len(extension_mos) > 1:
 			raise Exception(f'Multiple managed objects found with pas_extension={name}. Delete them and upload a new extension with the same name.')
+	return extension_mo
 
+def upload_or_delete(connection, extension_zip, name, delete, restart, ignoreVersion, printMsg, force=False, waitTimeout=None):
+	"""
+	Upload or delete the extension using a connection, see upload_or_delete_extension.
+	:return: True if the extension in the inventory was uploaded or deleted, False if it was already up to date or deleted.
+	"""
+	# checks Analytics builder version with Apama-ctrl version
+	checkVersions(connection, ignoreVersion)
+	checkIfExtensionsSupported(connection, ignoreVersion)
+		
+	extension_mo = get_extension_mo(connection, name)
+	digest = hash_file(extension_zip) if extension_zip and not delete else None
+	(changed, unchanged) = (False, False)
 	if extension_mo:
 		moId = extension_mo["id"]
 		if delete:
 			connection.request('DELETE', f'/inventory/binaries/{moId}')
+			changed = True
 			if printMsg: print(f'Deleted extension {name}')
+		elif digest and not force and extension_mo.get(PAS_EXT_DIGEST_FIELD) == digest:
+			unchanged = True
+			if printMsg: print(f'Extension {name} is unchanged, skipping the upload (use --force to upload it anyway)')
 		else:
 			replace_extension_content(connection, extension_zip, moId)
+			changed = True
+			if digest: record_extension_digest(connection, moId, digest)
 			if printMsg: print(f'Uploaded extension {name}')
 	else:
 		if delete:
 			print('Extension already deleted')
 		elif name:
-			upload_new_extension(connection, extension_zip, name)
+			moId = upload_new_extension(connection, extension_zip, name)
+			changed = True
+			if digest: record_extension_digest(connection, moId, digest)
 			if printMsg: print(f'Uploaded extension {name}')
 
-	if restart:
-		try:
-			connection.request('PUT', f'/service/cep/restart')
+	if restart and unchanged:
+		if printMsg: print('Restart not requested as the extension is unchanged')
+	elif restart:
+		requested = time.monotonic()
+		restart_apama_ctrl(connection, printMsg)
+		if waitTimeout is not None:
+			wait_for_apama_ctrl(connection, requested, waitTimeout, printMsg, name=None if delete else name)
+	return changed
+
+def restart_apama_ctrl(connection, printMsg=False):
+	"""
+	Request a restart of the Apama-ctrl microservice.
+	:param connection: Object to perform REST requests.
+	:param printMsg: Print the success message.
+	:return: None
+	"""
+	try:
+		connection.request('PUT', f'/service/cep/restart', retry=False) # a restart is never requested twice
+		if printMsg: print('Restart requested')
+	except urllib.error.HTTPError as ex:
+		# The microservice may go down before it has responded
+		if ex.code // 10 == 50:
 			if printMsg: print('Restart requested')
-		except (urllib.error.HTTPError, urllib.error.URLError) as ex:
-			statuscode = int(ex.code)
-			if statuscode // 10 == 50:
-				if printMsg: print('Restart requested')
-			else:
-				raise Exception(f'Failed to restart Apama-ctrl: {ex}')
-		except Exception as ex:
+		else:
 			raise Exception(f'Failed to restart Apama-ctrl: {ex}')
+	except Exception as ex:
+		raise Exception(f'Failed to restart Apama-ctrl: {ex}')
+
+def apama_ctrl_state(connection):
+	"""
+	:param connection: Connection which does not retry requests.
+	:return: None if the apama-ctrl does not respond with its version and capabilities, otherwise dictionary of its
+	'capabilities' and its 'status' (empty if the apama-ctrl does not report its status).
+	"""
+	try:
+		if not json.loads(connection.request('GET', '/service/cep/diagnostics/componentVersion')).get('releaseTrainVersion'):
+			return None
+		capabilities = json.loads(connection.request('GET', '/service/cep/capabilities'))
+		try:
+			status = json.loads(connection.request('GET', '/service/cep/diagnostics/apamaCtrlStatus'))
+		except urllib.error.HTTPError as ex:
+			if ex.code != 404: raise
+			status = {} # older versions of apama-ctrl do not report their status
+		return {'capabilities': capabilities, 'status': status} if isinstance(capabilities, dict) and isinstance(status, dict) else None
+	except Exception:
+		return None
+
+def loaded_extensions(state):
+	"""
+	:param state: The state of the apama-ctrl, see apama_ctrl_state.
+	:return: The set of the names of the extensions loaded by the apama-ctrl, from the user_extensions field of its
+	status, None if it does not report them.
+	"""
+	extensions = state['status'].get('user_extensions')
+	if isinstance(extensions, dict):
+		return set(extensions)
+	if isinstance(extensions, list):
+		return {e.get('name') if isinstance(e, dict) else e for e in extensions}
+	return None
+
+def wait_for_apama_ctrl(connection, requested, timeout=RESTART_TIMEOUT_SECS, printMsg=False, name=None):
+	"""
+	Wait for the apama-ctrl to restart and be ready to use, polling it with a bounded backoff while it is down, and
+	check that it has not restarted in safe mode, in which case the extensions are not loaded.
+
+	The restart is complete once the apama-ctrl is ready after having been seen down, or once it reports an uptime
+	shorter than the time since the restart request. An apama-ctrl which is never seen restarting is assumed to have
+	restarted after a grace period, at most the timeout.
+	:param connection: Object to perform REST requests.
+	:param requested: The time.monotonic() time at which the restart was requested.
+	:param timeout: The maximum time to wait in seconds, from the restart request.
+	:param printMsg: Print the downtime and the time to ready.
+	:param name: The name of an extension which the apama-ctrl must have loaded, if any.
+	:return: Tuple of the time in seconds for which the apama-ctrl was seen down (None if it was never seen down) and
+	the time in seconds from the restart request until it was ready.
+	"""
+	(down, up) = (None, None)
+	grace = min(RESTART_DOWN_GRACE_SECS, timeout)
+	with connection.polling_connection() as poller:
+		delay = RESTART_POLL_SECS
+		while True:
+			state = apama_ctrl_state(poller)
+			now = time.monotonic()
+			if state is None and down is None:
+				down = now
+			if state is not None:
+				uptime = state['status'].get('uptime_secs')
+				restarted = isinstance(uptime, (int, float)) and uptime <= now - requested
+				if down is not None or restarted or now - requested >= grace:
+					up = now
+					break
+			if now - requested >= timeout:
+				raise Exception(f'Apama-ctrl was not ready {timeout:.0f}s after requesting its restart' +
+					(f', it has been down for {now - down:.0f}s' if down is not None else ', it was never seen restarting'))
+			# Poll quickly until the restart is seen, so that the downtime is measured accurately
+			time.sleep(min(delay, max(0, requested + timeout - now)))
+			if down is not None:
+				delay = min(delay * 2, RESTART_POLL_MAX_SECS)
+
+	if state['status'].get('is_safe_mode'):
+		raise Exception('Apama-ctrl restarted in safe mode, so the extensions are not loaded. Replace or delete the invalid or corrupt extension and restart Apama-ctrl again.')
+	if name is not None:
+		extensions = loaded_extensions(state)
+		if extensions is None:
+			print(f'WARNING: Apama-ctrl does not report the extensions it has loaded, unable to check that {name} is loaded', file=sys.stderr)
+		elif name not in extensions:
+			raise Exception(f'Apama-ctrl restarted without loading the extension {name}, loaded extensions: {", ".join(sorted(map(str, extensions))) or "none"}')
+	downtime = up - down if down is not None else None
+	if printMsg:
+		if downtime is None:
+			print(f'Apama-ctrl was not seen restarting, it is ready {up - requested:.1f}s after requesting its restart')
+		else:
+			print(f'Apama-ctrl was down for {downtime:.1f}s and ready {up - requested:.1f}s after requesting its restart')
+	return (downtime, up - requested)
 
 def prepareRemoteOptions(args, remote):
 	"""
@@ -486,7 +1166,43 @@ def checkVersions(connection, ignoreVersion):
 		else:
 			raise Exception(f'Make sure the Apama Analytics Builder Block SDK version is compatible with the Apama-ctrl microservice version. Use the \'main\' branch for the current release or switch to the appropriate branch for Long-term support (LTS) / Maintenance releases.')
 
+def watch_extension(args):
+	"""
+	Build an extension, and build it again whenever its input files change, until interrupted.
+
+	The builds use the build cache (a temporary one if --cacheDir is not specified), so only the artifacts whose inputs
+	have changed are built again. The zip file is replaced atomically, so it is never seen partially written.
+	:param args: The arguments of the build extension command.
+	"""
+	import fileWatcher
+	cacheDir = args.cacheDir or os.path.join(args.tmpDir, 'cache')
+	buildDir = os.path.join(args.tmpDir, 'build')
+	output = os.path.abspath(args.output)
+	zip_path = output if output.endswith('.zip') else output + '.zip'
+	def ignore(path):
+		return path.endswith(UNSUPPORTED_FILE_TYPES) or path in (zip_path, zip_path + '.part')
+
+	with fileWatcher.create_watcher(args.input, (args.folderToSkip or []) + EXCLUDE_FOLDERS, ignore) as watcher:
+		try:
+			while True:
+				if os.path.exists(buildDir): shutil.rmtree(buildDir)
+				try:
+					build_extension(args.input, output, buildDir, args.cdp, args.priority, printMsg=True, folderToSkip=args.folderToSkip,
+						cacheDir=cacheDir, jobs=args.jobs, builtinParser=args.builtinParser)
+				except Exception as err:
+					print(f'Build failed: {err}', file=sys.stderr)
+				print(f'Watching {os.path.abspath(args.input)} for changes (using {watcher.kind}), press Ctrl+C to stop', flush=True)
+				changed = fileWatcher.wait_for_changes(watcher, WATCH_DEBOUNCE_SECS)
+				print(f'Rebuilding after changes to {len(changed)} file(s)')
+		except KeyboardInterrupt:
+			pass
+
 def run(args):
+	if args.watch:
+		if not (args.input and args.output) or args.delete or any(getattr(args, k, None) for k in ENV_VAR_MAP) or args.name:
+			raise Exception(f'Arguments --input and --output are required in watch mode, and it does not support remote operations')
+		return watch_extension(args)
+
 	# Support remote operations and whether they are mandatory.
 	remote = {'cumulocity_url':True, 'username':True, 'password':True, 'name':True, 'delete':False, 'restart':False}
 
@@ -511,14 +1227,112 @@ def run(args):
 
 	if not args.input and not args.delete:
 		raise Exception(f'Argument --input is required when not deleting an extension')
-
+	if args.wait and not args.restart:
+		raise Exception(f'Argument --wait requires --restart.')
 
 	zip_path = Path(args.tmpDir, args.name).with_suffix('.zip') if is_remote else args.output # Use the <name>.zip for the zip name which gets uploaded.
-	if not args.delete:
-		zip_path = build_extension(args.input, zip_path, args.tmpDir, args.cdp, args.priority, printMsg=bool(args.output),folderToSkip=args.folderToSkip)
+	if not args.delete and args.profile:
+		# Profile a local build, as the phases of a build run by the build server are not measured in this process
+		with buildProfiler.profile(args.profile, 'build extension'):
+			zip_path = build_extension(args.input, zip_path, args.tmpDir, args.cdp, args.priority, printMsg=bool(args.output),folderToSkip=args.folderToSkip, cacheDir=args.cacheDir, jobs=args.jobs, builtinParser=args.builtinParser)
+	elif not args.delete:
+		# Use the build server if one is running
+		import buildServer
+		(served, served_zip_path) = buildServer.request('build_extension', input=os.path.abspath(args.input), output=os.path.abspath(zip_path), tmpDir=os.path.abspath(args.tmpDir),
+			cdp=args.cdp, priority=args.priority, printMsg=bool(args.output), folderToSkip=args.folderToSkip,
+			cacheDir=os.path.abspath(args.cacheDir) if args.cacheDir else None, jobs=args.jobs, builtinParser=args.builtinParser)
+		if served:
+			zip_path = Path(served_zip_path)
+		else:
+			zip_path = build_extension(args.input, zip_path, args.tmpDir, args.cdp, args.priority, printMsg=bool(args.output),folderToSkip=args.folderToSkip, cacheDir=args.cacheDir, jobs=args.jobs, builtinParser=args.builtinParser)
 	if is_remote:
 		if args.output and not args.delete:
 			output = args.output + ('' if args.output.endswith('.zip') else '.zip')
 			shutil.copy2(zip_path, output)
 		return upload_or_delete_extension(zip_path, args.cumulocity_url, args.username,
-										  args.password, args.name, args.delete, args.restart, args.ignoreVersion, printMsg=True)
+										  args.password, args.name, args.delete, args.restart, args.ignoreVersion, printMsg=True, timeout=args.timeout, force=args.force,
+										  waitTimeout=args.waitTimeout if args.wait else None)
+
+def add_arguments_batch(parser):
+	""" Add parser arguments for building several extensions. """
+	parser.add_argument('--manifest', metavar='JSON_FILE', type=str, required=True, help='a JSON file listing the extensions to build, as a list of objects with "input" and "output" paths (relative to the JSON file) and optionally "cdp", "priority", "folderToSkip" and "builtinParser"')
+	parser.add_argument('--jobs', metavar='N', type=int, default=os.cpu_count() or 1, required=False, help='the maximum number of extensions to build concurrently, each in its own process (default the number of CPUs)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help='the directory of a persistent build cache shared by the builds')
+	parser.add_argument('--builtinParser', action='store_true', default=False, required=False, help='generate the block metadata of all the extensions with the built-in EPL parser instead of running ApamaDoc')
+
+BATCH_ENTRY_KEYS = {'input', 'output', 'cdp', 'priority', 'folderToSkip', 'builtinParser'}
+
+def read_batch_manifest(path):
+	"""
+	Read the list of extensions to build.
+	:param path: The JSON file listing the extensions.
+	:return: List of dictionaries of the arguments of build_extension, with absolute paths.
+	"""
+	with open(path, encoding=ENCODING) as f:
+		entries = json.load(f)
+	if not isinstance(entries, list) or not entries:
+		raise Exception(f'The build manifest must contain a list of extensions: {path}')
+	base = os.path.dirname(os.path.abspath(path))
+	for (i, entry) in enumerate(entries):
+		if not isinstance(entry, dict) or not entry.get('input') or not entry.get('output'):
+			raise Exception(f'Extension {i + 1} of the build manifest must have an "input" and an "output": {path}')
+		unknown = set(entry) - BATCH_ENTRY_KEYS
+		if unknown:
+			raise Exception(f'Unknown keys for extension {i + 1} of the build manifest: {", ".join(sorted(unknown))}')
+		entry['input'] = os.path.join(base, entry['input'])
+		entry['output'] = os.path.join(base, entry['output'])
+	outputs = [str(Path(e['output']).resolve().with_suffix('.zip')) for e in entries]
+	duplicates = sorted({o for o in outputs if outputs.count(o) > 1})
+	if duplicates:
+		raise Exception(f'The build manifest builds more than one extension into: {", ".join(duplicates)}')
+	return entries
+
+def build_batch_entry(entry, tmpDir, cacheDir, builtinParser):
+	"""
+	Build one extension of a batch, in a worker process.
+	:param entry: The arguments of build_extension from the build manifest.
+	:param tmpDir: The temporary directory of this build only.
+	:param cacheDir: The directory of the persistent build cache, or None.
+	:param builtinParser: The default for the builtinParser option.
+	:return: Tuple of the zip file (None if the build failed), the build time in seconds, the error message (None if successful) and the output of the build.
+	"""
+	output = io.StringIO()
+	start = time.monotonic()
+	(zip_path, error) = (None, None)
+	with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+		try:
+			kwargs = dict(entry)
+			kwargs.setdefault('builtinParser', builtinParser)
+			zip_path = str(build_extension(tmpDir=tmpDir, cacheDir=cacheDir, **kwargs))
+		except Exception as err:
+			error = str(err) or repr(err)
+	return (zip_path, time.monotonic() - start, error, output.getvalue())
+
+def run_batch(args):
+	entries = read_batch_manifest(args.manifest)
+	cacheDir = os.path.abspath(args.cacheDir) if args.cacheDir else None
+	if not args.builtinParser and not all(e.get('builtinParser') for e in entries):
+		confirmFullInstallation()
+
+	start = time.monotonic()
+	results = [None] * len(entries)
+	# Each build has its own process and temporary directory, so that builds never share state
+	with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(entries)))) as executor:
+		futures = {executor.submit(build_batch_entry, entry, os.path.join(args.tmpDir, str(i)), cacheDir, args.builtinParser): i
+			for (i, entry) in enumerate(entries)}
+		for future in concurrent.futures.as_completed(futures):
+			i = futures[future]
+			results[i] = future.result()
+			(zip_path, seconds, error, output) = results[i]
+			print(f'--- {entries[i]["output"]} from {entries[i]["input"]}: {"failed" if error else "built"} in {seconds:.1f}s')
+			if output: print(output.rstrip('\n'))
+			if error: print(f'ERROR: {error}')
+
+	print('\nBuild summary:')
+	width = max(len(os.path.basename(e['output'])) for e in entries)
+	for (entry, (zip_path, seconds, error, _)) in zip(entries, results):
+		print(f'  {os.path.basename(entry["output"]):<{width}}  {seconds:7.1f}s  {"FAILED: " + error if error else zip_path}')
+	failures = [r for r in results if r[2]]
+	print(f'Built {len(entries) - len(failures)} of {len(entries)} extensions in {time.monotonic() - start:.1f}s')
+	if failures:
+		raise Exception(f'{len(failures)} of {len(entries)} extensions failed to build')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Timing of the phases of a build, reported as JSON in the Chrome trace event format.
+
+The report is a JSON object with the 'traceEvents' of the phases, which can be loaded as is in chrome://tracing or
+https://ui.perfetto.dev, and a 'summary' with the totals of each phase for tracking build times.
+"""
+import contextlib, json, os, threading, time
+
+# The profiler of the build being profiled, if any
+_active = None
+
+class PhaseRecord(object):
+	"""
+	The measurements of a run of a build phase.
+	"""
+	def __init__(self, name):
+		self.name = name
+		self.thread = threading.get_ident()
+		self.threadName = threading.current_thread().name
+		self.bytes = 0
+		self.items = 0
+
+	def add(self, bytes=0, items=0):
+		"""
+		Count the data processed by the phase.
+		:param bytes: The number of bytes read or written.
+		:param items: The number of items processed, such as files or blocks.
+		"""
+		self.bytes += bytes
+		self.items += items
+
+class _NoRecord(object):
+	def add(self, bytes=0, items=0):
+		pass
+
+NO_RECORD = _NoRecord()
+
+def _children_cpu():
+	t = os.times()
+	return t.children_user + t.children_system
+
+class Profiler(object):
+	"""
+	Recorder of the build phases, which can run on several threads.
+	"""
+	def __init__(self, command):
+		self.command = command
+		self.start = time.perf_counter()
+		self.records = []
+		self.lock = threading.Lock()
+
+	@contextlib.contextmanager
+	def phase(self, name):
+		record = PhaseRecord(name)
+		(wall, cpu, childCpu) = (time.perf_counter(), time.thread_time(), _children_cpu())
+		try:
+			yield record
+		finally:
+			record.start = wall - self.start
+			record.wall = time.perf_counter() - wall
+			record.cpu = time.thread_time() - cpu
+			# Processes of the Apama tools which completed during the phase, which can include those of concurrent phases
+			record.childCpu = _children_cpu() - childCpu
+			with self.lock:
+				self.records.append(record)
+
+	def report(self):
+		"""
+		:return: The JSON object of the report.
+		"""
+		pid = os.getpid()
+		events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+			for (tid, name) in sorted({(r.thread, r.threadName) for r in self.records})]
+		summary = {}
+		for r in sorted(self.records, key=lambda r: r.start):
+			events.append({'name': r.name, 'cat': 'build', 'ph': 'X', 'pid': pid, 'tid': r.thread,
+				'ts': round(r.start * 1e6), 'dur': round(r.wall * 1e6),
+				'args': {'cpu': round(r.cpu, 6), 'childCpu': round(r.childCpu, 6), 'bytes': r.bytes, 'items': r.items}})
+			s = summary.setdefault(r.name, {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'childCpu': 0.0, 'bytes': 0, 'items': 0})
+			s['count'] += 1
+			for k in ('wall', 'cpu', 'childCpu', 'bytes', 'items'):
+				s[k] += getattr(r, k)
+		for s in summary.values():
+			for k in ('wall', 'cpu', 'childCpu'):
+				s[k] = round(s[k], 6)
+		return {'command': self.command, 'displayTimeUnit': 'ms', 'traceEvents': events, 'summary': summary}
+
+	def write(self, path):
+		with open(path, 'w', encoding='UTF8') as f:
+			json.dump(self.report(), f, indent=1)
+
+def phase(name):
+	"""
+	Measure a build phase, if the build is being profiled.
+	:param name: The name of the phase.
+	:return: Context manager returning a record to count the bytes and items processed by the phase.
+	"""
+	return _active.phase(name) if _active else contextlib.nullcontext(NO_RECORD)
+
+@contextlib.contextmanager
+def profile(path, command):
+	"""
+	Profile a build, measuring the phases of the build run in the context.
+	:param path: The file to write the report to, or None not to profile.
+	:param command: The name of the command being profiled, which is the outermost phase.
+	"""
+	global _active
+	if not path:
+		yield None
+		return
+	profiler = _active = Profiler(command)
+	try:
+		with profiler.phase(command):
+			yield profiler
+	finally:
+		_active = None
+		profiler.write(path)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+import contextlib, io, json, os, socket, socketserver, stat, struct, sys, tempfile, threading
+
+SOCKET_ENV = 'ANALYTICS_BUILDER_SOCKET'
+SERVER_VERSION = 1
+
+# True in the build server process, where requests must not be forwarded to the server again
+SERVING = False
+
+def socket_path(path=None, create=False):
+	"""
+	Get the path of the Unix socket of the build server.
+	:param path: The path specified by the user, if any.
+	:param create: Create the private directory of the default path if it does not exist, and check that only the user
+	can access it. Clients do not check it, as they only connect to a server run by the user, see _connect.
+	:return: The path, by default from the ANALYTICS_BUILDER_SOCKET environment variable or else in the runtime directory
+	of the user ($XDG_RUNTIME_DIR), or in a directory of the temporary directory only the user can access.
+	"""
+	path = path or os.getenv(SOCKET_ENV)
+	if path:
+		return os.path.abspath(path)
+	runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+	if runtime_dir and os.path.isdir(runtime_dir):
+		return os.path.join(runtime_dir, 'analytics_builder.sock')
+	directory = os.path.join(tempfile.gettempdir(), f'analytics_builder-{os.getuid()}')
+	if create:
+		try:
+			os.mkdir(directory, 0o700)
+		except FileExistsError:
+			pass
+		st = os.lstat(directory)
+		# Another user could otherwise have created the directory to put their own server in it
+		if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+			raise Exception(f'The build server directory {directory} must be a directory only accessible by the current user')
+	return os.path.join(directory, 'build.sock')
+
+def _check_owner(path, sock):
+	"""
+	Check that the server listening on a socket is run by the current user, so that no other user can receive the build
+	requests or return forged results.
+	"""
+	st = os.lstat(path)
+	if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+		raise Exception(f'The build server socket {path} is not owned by the current user')
+	if hasattr(socket, 'SO_PEERCRED'):
+		(_, uid, _) = struct.unpack('3i', sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+		if uid != os.getuid():
+			raise Exception(f'The build server on {path} is run by another user')
+
+def _apama_home():
+	return os.path.realpath(os.getenv('APAMA_HOME')) if os.getenv('APAMA_HOME') else None
+
+def _connect(path):
+	"""
+	Connect to the server listening on a socket.
+	:return: The connected socket, or None if no server run by the current user is listening on it.
+	"""
+	if not os.path.exists(path): return None
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(path)
+		_check_owner(path, sock)
+	except Exception:
+		sock.close()
+		return None
+	return sock
+
+def _send(path, message):
+	""" Send a request to the server and return its response, or None if no server run by the current user is listening on the socket. """
+	sock = _connect(path)
+	if sock is None: return None
+	with sock, sock.makefile('rwb') as f:
+		f.write(json.dumps(message).encode('utf8') + b'\n')
+		f.flush()
+		response = f.readline()
+	if not response:
+		raise Exception(f'The build server on {path} closed the connection without a response')
+	return json.loads(response)
+
+def request(command, **kwargs):
+	"""
+	Run a command in the build server, if there is one running with the same script version and Apama installation.
+	The output of the command is printed as if it was run locally.
+	:param command: The name of the command.
+	:param kwargs: The arguments of the command. Paths must be absolute.
+	:return: Tuple of whether the command was run by the server, and its result.
+	"""
+	if SERVING: return (False, None)
+	import blockMetadataGenerator
+	try:
+		path = socket_path()
+	except Exception:
+		return (False, None) # build locally rather than fail if the default socket cannot be found
+	response = _send(path, {'version': SERVER_VERSION, 'scriptVersion': blockMetadataGenerator.SCRIPT_VERSION,
+		'apamaHome': _apama_home(), 'command': command, 'kwargs': kwargs})
+	if response is None or 'unavailable' in response:
+		return (False, None)
+	sys.stdout.write(response['stdout'])
+	sys.stderr.write(response['stderr'])
+	if response['error'] is not None:
+		raise Exception(response['error'])
+	return (True, response['result'])
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		line = self.rfile.readline()
+		if not line: return
+		response = self.server.dispatch(json.loads(line))
+		self.wfile.write(json.dumps(response).encode('utf8') + b'\n')
+
+class BuildServer(socketserver.UnixStreamServer):
+	"""
+	Server running build requests from other analytics_builder processes, one at a time.
+
+	The server saves starting Python and importing the build scripts for every build, and all builds share its build
+	cache, so the ApamaDoc and engine_package results of unchanged files are reused across builds. It does not keep the
+	Apama tools running: ApamaDoc and engine_package are started for every build which has changed files to document or
+	package, as they are command line tools which run a single job and exit.
+	"""
+	def __init__(self, path, cacheDir):
+		import blockMetadataGenerator, buildExtension
+		self.commands = {
+			'build_extension': lambda **kwargs: str(buildExtension.build_extension(**kwargs)),
+			'build_metadata': blockMetadataGenerator.run_metadata_generator,
+		}
+		self.scriptVersion = blockMetadataGenerator.SCRIPT_VERSION
+		self.cacheDir = cacheDir
+		# Only the current user may connect, from the moment the socket is created
+		umask = os.umask(0o177)
+		try:
+			super().__init__(path, BuildRequestHandler)
+		finally:
+			os.umask(umask)
+
+	def dispatch(self, request):
+		if request.get('version') != SERVER_VERSION:
+			return {'unavailable': 'different version'}
+		if request['command'] == 'stop':
+			threading.Thread(target=self.shutdown).start()
+			return {'result': None, 'stdout': '', 'stderr': '', 'error': None}
+		if request.get('scriptVersion') != self.scriptVersion:
+			return {'unavailable': 'different version'}
+		if request.get('apamaHome') != _apama_home():
+			return {'unavailable': 'different Apama installation'}
+
+		kwargs = request['kwargs']
+		if not kwargs.get('cacheDir'): kwargs['cacheDir'] = self.cacheDir
+		(stdout, stderr) = (io.StringIO(), io.StringIO())
+		(result, error) = (None, None)
+		try:
+			with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+				result = self.commands[request['command']](**kwargs)
+		except Exception as err:
+			error = str(err) or repr(err)
+		return {'result': result, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'error': error}
+
+def add_arguments_start(parser):
+	parser.add_argument('--socket', metavar='PATH', type=str, required=False, help=f'the Unix socket to listen on (default ${SOCKET_ENV} or a socket in $XDG_RUNTIME_DIR or a private directory of the temporary directory)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help='the directory of the build cache shared by the builds; by default a temporary directory, deleted when the server stops')
+
+def add_arguments_stop(parser):
+	parser.add_argument('--socket', metavar='PATH', type=str, required=False, help=f'the Unix socket of the server (default ${SOCKET_ENV} or a socket in $XDG_RUNTIME_DIR or a private directory of the temporary directory)')
+
+def run_start(args):
+	global SERVING
+	path = socket_path(args.socket, create=True)
+	if os.path.exists(path):
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(path)
+			raise Exception(f'A build server is already running on {path}')
+		except OSError:
+			os.unlink(path) # left over by a server which did not stop cleanly
+		finally:
+			probe.close()
+
+	SERVING = True
+	with contextlib.ExitStack() as stack:
+		cacheDir = os.path.abspath(args.cacheDir) if args.cacheDir else stack.enter_context(tempfile.TemporaryDirectory(prefix='analytics_builder_cache_'))
+		server = BuildServer(path, cacheDir)
+		stack.callback(os.unlink, path)
+		with server:
+			print(f'Build server listening on {path}', flush=True)
+			try:
+				server.serve_forever()
+			except KeyboardInterrupt:
+				pass
+	print('Build server stopped')
+
+def run_stop(args):
+	path = socket_path(args.socket)
+	response = _send(path, {'version': SERVER_VERSION, 'command': 'stop'})
+	if response is None:
+		raise Exception(f'No build server is running on {path}')
+	if 'unavailable' in response:
+		raise Exception(f'The build server on {path} is from a different version of the scripts')
+	print(f'Stopped build server on {path}')
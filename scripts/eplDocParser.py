@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Built-in extractor of the Apama Doc of EPL events, used instead of ApamaDoc to generate the block metadata.
+
+It only understands the declarations of events at the top level of a file: their fields, constants and the signatures
+of their actions, with the doc comments on them. Everything else (monitors, action bodies, ...) is skipped. The result
+has the same elements as the structure.xml generated by ApamaDoc for these declarations. Files it cannot document as
+ApamaDoc does, such as files declaring events in monitors, raise UnsupportedEPL so that ApamaDoc is used instead.
+"""
+import json, re
+import xml.etree.ElementTree as ElementTree
+
+VERSION = 3 # Changed whenever the parser extracts different documentation, so that cached block metadata is not reused
+
+EPL_TOKEN = re.compile(r'''
+	(?P<space>\s+)
+	|(?P<doc>/\*\*(?!/).*?\*/)
+	|(?P<comment>/\*.*?\*/|//[^\n]*)
+	|(?P<string>"(?:\\.|[^"\\])*")
+	|(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?d?)
+	|(?P<name>\#?[A-Za-z_$][\w$]*(?:\.\#?[A-Za-z_$][\w$]*)*)
+	|(?P<op>:=|.)
+''', re.S | re.X)
+
+# Types that are never qualified with a package in structure.xml
+EPL_BUILTIN_TYPES = {'any', 'boolean', 'chunk', 'context', 'decimal', 'dictionary', 'float', 'integer', 'listener',
+	'location', 'optional', 'sequence', 'stream', 'string', 'action'}
+
+class EPLSyntaxError(Exception):
+	def __init__(self, path, line, message):
+		super().__init__('%s:%d: %s' % (path, line, message))
+
+class UnsupportedEPL(EPLSyntaxError):
+	""" EPL which the built-in parser cannot document as ApamaDoc does. """
+
+# The escape sequences of EPL string literals
+EPL_STRING_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+JSON_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+class Token(object):
+	def __init__(self, kind, text, pos):
+		self.kind = kind
+		self.text = text
+		self.pos = pos
+
+def tokenize(code):
+	"""
+	Split EPL code into tokens, dropping white space and the comments which are not doc comments.
+	:param code: The EPL code.
+	:return: List of Token objects.
+	"""
+	return [Token(m.lastgroup, m.group(), m.start()) for m in EPL_TOKEN.finditer(code) if m.lastgroup not in ('space', 'comment')]
+
+def literal_json(tokens):
+	"""
+	Convert the value of a constant into the JSON the block metadata generator decodes default and enumeration values
+	from, which is the EPL literal for strings, booleans and float and integer numbers.
+	:param tokens: The tokens of the value.
+	:return: The JSON text, or None if the value is not a string, boolean or number literal.
+	"""
+	texts = [t.text for t in tokens]
+	if len(texts) == 1 and tokens[0].kind == 'string':
+		value = ''
+		for m in re.finditer(r'\\(.)|[^\\]', texts[0][1:-1], re.S):
+			if m.group(1) is None: value += m.group()
+			elif m.group(1) in EPL_STRING_ESCAPES: value += EPL_STRING_ESCAPES[m.group(1)]
+			else: return None
+		return json.dumps(value, ensure_ascii=False)
+	if texts in (['true'], ['false']):
+		return texts[0]
+	if len(texts) == 2 and texts[0] in ('-', '+'):
+		texts = texts[1:] if texts[0] == '+' else ['-' + texts[1]]
+	if len(texts) == 1 and JSON_NUMBER.fullmatch(texts[0].rstrip('d')):
+		return texts[0].rstrip('d') # the decimal suffix
+	return None
+
+def _join_doc_lines(lines):
+	"""
+	Join the lines of a doc comment text as ApamaDoc does: the lines of a paragraph are joined into a single line,
+	paragraphs are separated by a blank line, and the lines of <pre> blocks are kept as they are.
+	:param lines: The lines, without their leading '*'.
+	:return: The text, None if empty.
+	"""
+	text = ''
+	(pre, blank) = (False, False)
+	for line in lines:
+		if pre:
+			text += '\n' + (line[1:] if line.startswith(' ') else line).rstrip()
+		elif not line.strip():
+			blank = bool(text)
+			continue
+		else:
+			text += ('\n\n' if blank else ' ' if text else '') + line.strip()
+		blank = False
+		if '<pre>' in line or '</pre>' in line:
+			pre = line.rfind('<pre>') > line.rfind('</pre>')
+	return text.strip() or None
+
+def parse_doc_comment(text):
+	"""
+	Split a doc comment into its main text and its tags.
+	:param text: The doc comment, including the delimiters.
+	:return: Tuple of the main text (None if empty) and the list of (tag name, tag text) tuples, tag text being None if
+	empty. The lines of the texts are joined as by ApamaDoc, see _join_doc_lines.
+	"""
+	lines = [re.sub(r'^\s*\*?', '', line) for line in text[3:-2].split('\n')]
+	main = []
+	tags = []
+	for line in lines:
+		m = re.match(r'\s*@(\S+)\s?(.*)', line)
+		if m:
+			tags.append([m.group(1), [m.group(2)]])
+		elif tags:
+			tags[-1][1].append(line)
+		else:
+			main.append(line)
+	return (_join_doc_lines(main), [(name, _join_doc_lines(t)) for (name, t) in tags])
+
+class EPLDocParser(object):
+	"""
+	Parser of the event declarations of one EPL file.
+	"""
+	def __init__(self, path, code):
+		self.path = path
+		self.code = code
+		self.tokens = tokenize(code)
+		self.i = 0
+		self.package = ''
+		self.usings = {}	# type name to package
+		self.events = []	# list of event dictionaries
+
+	def error(self, message, exception=EPLSyntaxError):
+		pos = self.tokens[self.i].pos if self.i < len(self.tokens) else len(self.code)
+		raise exception(self.path, self.code.count('\n', 0, pos) + 1, message)
+
+	def peek(self, offset=0):
+		return self.tokens[self.i + offset].text if self.i + offset < len(self.tokens) else None
+
+	def next(self):
+		if self.i >= len(self.tokens): self.error('unexpected end of file')
+		self.i += 1
+		return self.tokens[self.i - 1]
+
+	def expect(self, text=None, kind=None):
+		token = self.next()
+		if (text is not None and token.text != text) or (kind is not None and token.kind != kind):
+			self.i -= 1
+			self.error('expected %s but found \'%s\'' % (text or kind, token.text))
+		return token.text
+
+	def skipBlock(self):
+		""" Skip a block, from its opening brace to its matching closing brace. """
+		self.expect('{')
+		depth = 1
+		while depth:
+			text = self.next().text
+			if text == '{': depth += 1
+			elif text == '}': depth -= 1
+
+	def skipMonitor(self):
+		""" Skip a monitor, which must not declare events as they are documented as members of the monitor. """
+		self.expect(kind='name')
+		start = self.i
+		self.skipBlock()
+		for i in range(start, self.i - 2):
+			if self.tokens[i].text == 'event' and self.tokens[i + 1].kind == 'name' and self.tokens[i + 2].text == '{':
+				self.i = i
+				self.error('event %s is declared in a monitor' % self.tokens[i + 1].text, UnsupportedEPL)
+
+	def skipDeclaration(self):
+		""" Skip anything up to the end of a statement or a block. """
+		while True:
+			text = self.peek()
+			if text is None or text == '}': return
+			if text == '{': return self.skipBlock()
+			self.next()
+			if text == ';': return
+
+	def skipAnnotation(self):
+		self.expect('@')
+		self.expect(kind='name')
+		if self.peek() == '(':
+			depth = 0
+			while True:
+				text = self.next().text
+				if text == '(': depth += 1
+				elif text == ')': depth -= 1
+				if not depth: return
+
+	def parseType(self):
+		""" Parse a type, such as 'dictionary<string, sequence<float> >' into a (name, type parameters) tuple. """
+		name = self.expect(kind='name')
+		params = []
+		if self.peek() == '<':
+			self.next()
+			while self.peek() != '>':
+				params.append(self.parseType())
+				if self.peek() == ',': self.next()
+				elif self.peek() != '>': self.error('expected \',\' or \'>\' in type parameters of %s' % name)
+			self.next()
+		if name == 'action' and self.peek() == 'returns':
+			self.next()
+			self.parseType()
+		return (name, params)
+
+	def parse(self):
+		"""
+		Parse the file.
+		:return: self
+		"""
+		doc = None
+		while self.i < len(self.tokens):
+			token = self.tokens[self.i]
+			if token.kind == 'doc':
+				doc = self.next().text
+				continue
+			if token.text == '@':
+				self.skipAnnotation()
+				continue
+			if token.text == 'package':
+				self.next()
+				self.package = self.expect(kind='name')
+				self.expect(';')
+			elif token.text == 'using':
+				self.next()
+				(package, _, name) = self.expect(kind='name').rpartition('.')
+				self.usings[name] = package
+				self.expect(';')
+			elif token.text == 'event':
+				self.next()
+				self.parseEvent(doc)
+			elif token.text == 'monitor' or (token.text == 'persistent' and self.peek(1) == 'monitor'):
+				if token.text == 'persistent': self.next()
+				self.next()
+				self.skipMonitor()
+			elif token.text == '}':
+				self.error('unexpected \'}\'')
+			else:
+				self.skipDeclaration()
+			doc = None
+		return self
+
+	def parseEvent(self, doc):
+		event = {'name': self.expect(kind='name'), 'doc': doc, 'members': [], 'actions': []}
+		self.events.append(event)
+		self.expect('{')
+		doc = None
+		while self.peek() != '}':
+			if self.peek() is None: self.error('unexpected end of file in event %s' % event['name'])
+			token = self.tokens[self.i]
+			if token.kind == 'doc':
+				doc = self.next().text
+				continue
+			if token.text == '@':
+				self.skipAnnotation()
+				continue
+			if token.text == 'wildcard':
+				self.next()
+				continue
+			if token.text == 'constant':
+				self.next()
+				memberType = self.parseType()
+				name = self.expect(kind='name')
+				self.expect(':=')
+				start = self.i
+				while self.peek() not in (';', None): self.next()
+				value = literal_json(self.tokens[start:self.i])
+				if value is None:
+					# Only the values of the $ constants and of the constants of the parameters are used in the block metadata
+					if name.startswith('$') or event['name'].endswith('_$Parameters'):
+						self.i = start
+						self.error('the value of constant %s.%s is not a literal' % (event['name'], name), UnsupportedEPL)
+					value = self.code[self.tokens[start].pos:self.tokens[self.i - 1].pos + len(self.tokens[self.i - 1].text)].strip()
+				self.expect(';')
+				event['members'].append({'name': name, 'type': memberType, 'doc': doc, 'value': value})
+			elif token.text in ('static', 'action') and self.peek(1) != '<':
+				if token.text == 'static': self.next()
+				self.expect('action')
+				event['actions'].append(self.parseAction(doc))
+			elif token.kind == 'name' and token.text != 'event':
+				memberType = self.parseType()
+				event['members'].append({'name': self.expect(kind='name'), 'type': memberType, 'doc': doc})
+				self.expect(';')
+			else:
+				self.skipDeclaration()
+			doc = None
+		self.next()
+
+	def parseAction(self, doc):
+		action = {'name': self.expect(kind='name'), 'doc': doc, 'parameters': []}
+		self.expect('(')
+		while self.peek() != ')':
+			paramType = self.parseType()
+			action['parameters'].append({'name': self.expect(kind='name'), 'type': paramType})
+			if self.peek() == ',': self.next()
+			elif self.peek() != ')': self.error('expected \',\' or \')\' in parameters of action %s' % action['name'])
+		self.next()
+		if self.peek() == 'returns':
+			self.next()
+			self.parseType()
+		if self.peek() == ';': self.next()
+		else: self.skipBlock()
+		return action
+
+
+def _resolveType(typeName, file, definedTypes):
+	""" Get the attributes of a type reference: the package is only known for types defined in the input files or imported with 'using'. """
+	if typeName in EPL_BUILTIN_TYPES:
+		return {'type': typeName}
+	if '.' in typeName:
+		(package, _, name) = typeName.rpartition('.')
+		return {'package': package, 'type': name} if (package, name) in definedTypes else {'type': typeName}
+	if typeName in file.usings:
+		return {'package': file.usings[typeName], 'type': typeName}
+	if (file.package, typeName) in definedTypes:
+		return {'package': file.package, 'type': typeName}
+	return {'type': typeName}
+
+def _typeElement(tag, attrib, eplType, file, definedTypes):
+	element = ElementTree.Element(tag, attrib)
+	element.attrib.update(_resolveType(eplType[0], file, definedTypes))
+	if eplType[1]:
+		params = ElementTree.SubElement(element, 'Parameters')
+		for t in eplType[1]:
+			params.append(_typeElement('Parameter', {}, t, file, definedTypes))
+	return element
+
+def _addDescription(element, text):
+	ElementTree.SubElement(element, 'Description').text = text
+
+def _addDoc(element, doc, paramElements=None):
+	""" Add the description and the dollar fields of a doc comment to an element, and the description of its parameters. """
+	(main, tags) = parse_doc_comment(doc)
+	_addDescription(element, main)
+	dollarFields = [(name, text) for (name, text) in tags if name.startswith('$')]
+	if dollarFields:
+		parent = ElementTree.SubElement(element, 'DollarFields')
+		for (name, text) in dollarFields:
+			_addDescription(ElementTree.SubElement(parent, 'DollarField', {'name': name}), text)
+	for (name, text) in tags:
+		if name == 'param' and text and paramElements:
+			(paramName, _, paramText) = text.partition(' ')
+			if paramName in paramElements and paramText.strip() and paramElements[paramName].find('Description') is None:
+				_addDescription(paramElements[paramName], paramText.strip())
+
+def parse_monitors(mons):
+	"""
+	Extract the Apama Doc of the events defined in EPL files.
+	:param mons: The .mon files.
+	:return: The root element of a structure.xml document.
+	"""
+	files = []
+	for mon in mons:
+		with open(mon, encoding='utf-8-sig') as f:
+			files.append(EPLDocParser(mon, f.read()).parse())
+	definedTypes = {(file.package, event['name']) for file in files for event in file.events}
+
+	packages = {}
+	for file in files:
+		for event in file.events:
+			typeElement = ElementTree.Element('Type', {'category': 'Event', 'name': event['name']})
+			if event['doc']: _addDoc(typeElement, event['doc'])
+			else: _addDescription(typeElement, None)
+			for member in event['members']:
+				attrib = {'name': member['name']}
+				if 'value' in member: attrib.update({'constant': 'true', 'typeValue': member['value']})
+				memberElement = _typeElement('Member', attrib, member['type'], file, definedTypes)
+				if member['doc']: _addDoc(memberElement, member['doc'])
+				typeElement.append(memberElement)
+			for action in event['actions']:
+				actionElement = ElementTree.SubElement(typeElement, 'Action', {'name': action['name']})
+				paramElements = {}
+				if action['parameters']:
+					params = ElementTree.SubElement(actionElement, 'Parameters')
+					for p in action['parameters']:
+						paramElements[p['name']] = _typeElement('Parameter', {'name': p['name']}, p['type'], file, definedTypes)
+						params.append(paramElements[p['name']])
+				if action['doc']: _addDoc(actionElement, action['doc'], paramElements)
+			packages.setdefault(file.package, []).append(typeElement)
+
+	root = ElementTree.Element('Packages')
+	for name in sorted(packages, reverse=True):
+		package = ElementTree.SubElement(root, 'Package', {'name': name})
+		package.extend(sorted(packages[name], key=lambda t: t.get('name')))
+	return root
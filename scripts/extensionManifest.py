@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+import os, threading
+from pathlib import Path
+from buildCache import hash_file
+
+class ManifestFile(object):
+	"""
+	A file of the input directory, with the stat info it had when the input directory was scanned.
+	"""
+	def __init__(self, path, relpath, stat):
+		self.path = path
+		self.relpath = relpath
+		self.size = stat.st_size
+		self.mtime_ns = stat.st_mtime_ns
+		self.ino = stat.st_ino
+
+	def stamp(self):
+		""" The stat info which changes when the content of the file changes. """
+		return [self.size, self.mtime_ns, self.ino]
+
+class InputManifest(object):
+	"""
+	The files of an extension input directory, found by a single scan shared by all the build phases.
+	"""
+	def __init__(self, input, files, pruned):
+		"""
+		:param input: The input directory.
+		:param files: List of ManifestFile objects, sorted by path.
+		:param pruned: The directories which were skipped, with everything in them.
+		"""
+		self.input = input
+		self.files = files
+		self.pruned = pruned
+		self.digests = {}
+		self.lock = threading.Lock()
+
+	@classmethod
+	def scan(cls, input, excludeFolders=(), excludeFileTypes=()):
+		"""
+		Scan an input directory. Symbolic links to directories are not followed, as with os.walk.
+		:param input: The input directory.
+		:param excludeFolders: Names of directories to skip, wherever they are. They are not traversed at all.
+		:param excludeFileTypes: Extensions of the files to leave out.
+		:return: The InputManifest.
+		"""
+		input = os.fspath(input)
+		files = []
+		pruned = []
+		dirs = [input]
+		while dirs:
+			with os.scandir(dirs.pop()) as it:
+				for entry in it:
+					if entry.is_dir():
+						if entry.name in excludeFolders:
+							pruned.append(entry.path)
+						elif not entry.is_symlink():
+							dirs.append(entry.path)
+					elif not entry.name.endswith(tuple(excludeFileTypes)):
+						files.append(ManifestFile(entry.path, os.path.relpath(entry.path, input), entry.stat()))
+		files.sort(key=lambda f: f.path)
+		return cls(input, files, sorted(pruned))
+
+	def unmatchedFolders(self, names):
+		"""
+		:param names: Names of directories which were skipped.
+		:return: List of the names which are not the name of any skipped directory of the input directory.
+		"""
+		pruned = {os.path.basename(p) for p in self.pruned}
+		return [n for n in names if n not in pruned]
+
+	def paths(self, suffix=''):
+		"""
+		:param suffix: Only include the files whose name ends with it.
+		:return: List of the paths of the files, sorted.
+		"""
+		return [f.path for f in self.files if f.path.endswith(suffix)]
+
+	def mons(self):
+		""" :return: List of the paths of the .mon files, sorted. """
+		return self.paths('.mon')
+
+	def messageFiles(self):
+		""" :return: List of the messages.json files, followed by the *-messages.json files, as Path objects. """
+		names = [Path(f.path) for f in self.files]
+		return [p for p in names if p.name == 'messages.json'] + [p for p in names if p.name.endswith('-messages.json')]
+
+	def digest(self, path):
+		"""
+		Get the content hash of a file, hashing each file at most once per manifest.
+		:param path: The path of a file of the manifest.
+		:return: The hex digest.
+		"""
+		path = os.fspath(path)
+		with self.lock:
+			if path in self.digests: return self.digests[path]
+		d = hash_file(path)
+		with self.lock:
+			self.digests[path] = d
+		return d
+
+	def useDigests(self, cache):
+		"""
+		Take the content hashes of the files whose stat info has not changed since they were last hashed from a build cache,
+		and store the others in it.
+		:param cache: The BuildCache object.
+		"""
+		self.digests.update(cache.file_digests([(f.path, f.stamp()) for f in self.files]))
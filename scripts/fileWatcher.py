@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Watchers of the changes to the files of a directory tree, using inotify on Linux, or else polling the tree.
+"""
+import abc, ctypes, ctypes.util, os, select, struct, time
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')	# wd, mask, cookie, len
+
+class Watcher(abc.ABC):
+	"""
+	Base class of the watchers of a directory tree.
+	"""
+	def __init__(self, root, excludeFolders=(), ignore=None):
+		"""
+		:param root: The directory to watch.
+		:param excludeFolders: Names of directories not to watch, wherever they are.
+		:param ignore: Function called with the path of a changed file, returning True if the change is to be ignored.
+		"""
+		self.root = os.path.abspath(root)
+		self.excludeFolders = set(excludeFolders)
+		self.ignore = ignore or (lambda path: False)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		self.close()
+
+	def close(self):
+		pass
+
+	@abc.abstractmethod
+	def wait(self, timeout):
+		"""
+		Wait for changes.
+		:param timeout: The maximum time to wait in seconds.
+		:return: The set of changed paths, empty if nothing changed before the timeout.
+		"""
+
+	def walk_dirs(self, top=None):
+		"""
+		:param top: The directory to start from, by default the root of the tree.
+		:return: Iterator of the (directory, file names) tuples of the tree to watch, skipping the excluded directories.
+		"""
+		for (root, dirs, files) in os.walk(top or self.root):
+			dirs[:] = [d for d in dirs if d not in self.excludeFolders]
+			yield (root, files)
+
+class InotifyWatcher(Watcher):
+	"""
+	Watcher using the Linux inotify API, with a watch on each directory of the tree.
+	"""
+	kind = 'inotify'
+
+	def __init__(self, root, excludeFolders=(), ignore=None):
+		super().__init__(root, excludeFolders, ignore)
+		self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+		self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+		self.dirs = {}	# watch descriptor to directory
+		try:
+			for (d, _) in self.walk_dirs():
+				self._addWatch(d)
+		except BaseException:
+			self.close()
+			raise
+
+	def _addWatch(self, path):
+		wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+		if wd < 0:
+			errno = ctypes.get_errno()
+			if errno == 2: return	# deleted in the meantime
+			raise OSError(errno, f'Cannot watch {path}: {os.strerror(errno)}')
+		self.dirs[wd] = path
+
+	def close(self):
+		if self.fd >= 0:
+			os.close(self.fd)
+			self.fd = -1
+
+	def wait(self, timeout):
+		changed = set()
+		if not select.select([self.fd], [], [], timeout)[0]:
+			return changed
+		try:
+			buffer = os.read(self.fd, 64 * 1024)
+		except BlockingIOError:
+			return changed
+		offset = 0
+		while offset < len(buffer):
+			(wd, mask, _, length) = EVENT_HEADER.unpack_from(buffer, offset)
+			name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].split(b'\0', 1)[0]
+			offset += EVENT_HEADER.size + length
+			if mask & IN_Q_OVERFLOW:
+				changed.add(self.root)	# events were lost, anything may have changed
+				continue
+			if mask & IN_IGNORED:
+				self.dirs.pop(wd, None)
+				continue
+			if wd not in self.dirs: continue
+			path = os.path.join(self.dirs[wd], os.fsdecode(name)) if name else self.dirs[wd]
+			if mask & IN_ISDIR:
+				if os.path.basename(path) in self.excludeFolders: continue
+				if mask & (IN_CREATE | IN_MOVED_TO):
+					# Watch the new directory, and report the files created in it before it was watched
+					for (d, files) in self.walk_dirs(path):
+						self._addWatch(d)
+						changed.update(p for p in (os.path.join(d, f) for f in files) if not self.ignore(p))
+			if not self.ignore(path):
+				changed.add(path)
+		return changed
+
+class PollingWatcher(Watcher):
+	"""
+	Watcher comparing the size and modification time of the files of the tree at regular intervals.
+	"""
+	kind = 'polling'
+
+	def __init__(self, root, excludeFolders=(), ignore=None, interval=1.0):
+		super().__init__(root, excludeFolders, ignore)
+		self.interval = interval
+		self.snapshot = self._scan()
+
+	def _scan(self):
+		snapshot = {}
+		for (d, _) in self.walk_dirs():
+			try:
+				with os.scandir(d) as it:
+					for entry in it:
+						if not entry.is_dir() and not self.ignore(entry.path):
+							try:
+								stat = entry.stat()
+								snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+							except FileNotFoundError:
+								pass
+			except (FileNotFoundError, NotADirectoryError):
+				pass
+		return snapshot
+
+	def wait(self, timeout):
+		deadline = time.monotonic() + timeout
+		while True:
+			snapshot = self._scan()
+			changed = {p for p in snapshot.keys() | self.snapshot.keys() if snapshot.get(p) != self.snapshot.get(p)}
+			self.snapshot = snapshot
+			remaining = deadline - time.monotonic()
+			if changed or remaining <= 0:
+				return changed
+			time.sleep(min(self.interval, remaining))
+
+def create_watcher(root, excludeFolders=(), ignore=None):
+	"""
+	Create the best watcher available on this platform.
+	:param root: The directory to watch.
+	:param excludeFolders: Names of directories not to watch, wherever they are.
+	:param ignore: Function called with the path of a changed file, returning True if the change is to be ignored.
+	:return: An InotifyWatcher, or a PollingWatcher if inotify is not available (or the system limit on watches is reached).
+	"""
+	try:
+		return InotifyWatcher(root, excludeFolders, ignore)
+	except (OSError, AttributeError, TypeError):
+		return PollingWatcher(root, excludeFolders, ignore)
+
+def wait_for_changes(watcher, debounce=0.5):
+	"""
+	Wait until files have changed and then stopped changing, so that a save of many files is seen as a single change.
+	:param watcher: The Watcher.
+	:param debounce: The time in seconds without further changes after which the changes are considered complete.
+	:return: The set of changed paths.
+	"""
+	changed = set()
+	while not changed:
+		changed = watcher.wait(3600)
+	while True:
+		more = watcher.wait(debounce)
+		if not more:
+			return changed
+		changed |= more
@@ -2,7 +2,7 @@
 
 # Copyright (c) 2019-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
 # Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
-import json, os, sys, re
+import json, os, sys, re, mmap, concurrent.futures
 from pathlib import Path
 
 import buildExtension
@@ -12,51 +12,101 @@ BLOCK_METADATA_EVENT = buildExtension.BLOCK_METADATA_EVENT
 BLOCK_MESSAGES_EVENT = buildExtension.BLOCK_MESSAGES_EVENT
 BLOCK_REGISTRY_CHANNEL = buildExtension.BLOCK_REGISTRY_CHANNEL
 LOCALES = 'EN,DE,PL,PT_BR,ZH_CN,ZH_TW,NL,FR,JA_JP,KO,ES'
+ARGUMENT_SEPARATOR = re.compile(r'\s*,\s*')
+# The least size of evt files for each process of json extract to extract, extracting less takes less time than starting a process
+MIN_BYTES_PER_JOB = 2 * 1024 * 1024
 
 def add_arguments_extract(parser):
 	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain <name>_messages.evt and <name>_metadata.evt)')
 	parser.add_argument('--output', metavar='OUTPUT', type=str, required=True, help='the output directory')
+	parser.add_argument('--jobs', metavar='N', type=int, default=os.cpu_count() or 1, required=False, help='the maximum number of evt files to extract concurrently, each in its own process (default the number of CPUs); at most one process is started for each %d MB of evt files, so small inputs are extracted serially' % (MIN_BYTES_PER_JOB // (1024 * 1024)))
 
 def add_arguments_pack(parser):
 	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain <name>-messages.json and <name>.json)')
 	parser.add_argument('--output', metavar='OUTPUT', type=str, required=True, help='the output directory')
 	parser.add_argument('--name', metavar='NAME', type=str, required=True, help='the name of the block catalog')
 
+def find_events(data):
+	"""
+	Find the block metadata and messages events in the content of an evt file, without decoding the rest of it.
+	:param data: The content of the evt file, as bytes or a memory map.
+	:return: Iterator of (suffix of the JSON file, arguments of the event) tuples, in the order of the lines of the file,
+	the arguments being the bytes between the first and the last parenthesis of the line.
+	"""
+	events = (BLOCK_METADATA_EVENT.encode(ENCODING), BLOCK_MESSAGES_EVENT.encode(ENCODING))
+	pos = 0
+	while True:
+		starts = [i for i in (data.find(event, pos) for event in events) if i != -1]
+		if not starts: return
+		lineStart = data.rfind(b'\n', 0, min(starts)) + 1
+		lineEnd = data.find(b'\n', lineStart)
+		if lineEnd == -1: lineEnd = len(data)
+		pos = lineEnd
+		suffix = '-messages' if data.find(events[1], lineStart, lineEnd) != -1 else ''
+		argsStart = data.find(b'(', lineStart, lineEnd)
+		argsEnd = data.rfind(b')', lineStart, lineEnd)
+		if argsStart != -1 and argsEnd > argsStart:
+			yield (suffix, data[argsStart + 1:argsEnd])
+
+def decode_event_arguments(args):
+	"""
+	Decode the arguments of a block metadata or messages event.
+	:param args: The bytes of the arguments, the name of the block catalog, the locale and the JSON string literal.
+	:return: Tuple of the name, the locale and the decoded JSON object.
+	"""
+	text = args.decode(ENCODING)
+	decoder = json.JSONDecoder()
+	values = []
+	pos = 0
+	for i in range(3):
+		if i: pos = ARGUMENT_SEPARATOR.match(text, pos).end()
+		(value, pos) = decoder.raw_decode(text, pos)
+		values.append(value)
+	(name, lang, jsonstr) = values
+	return (name, lang, json.loads(jsonstr))
+
+def extract_evt_file(filename, output):
+	"""
+	Extract the JSON of the block metadata and messages events of an evt file. The file is memory-mapped, so that only
+	the arguments of the events are copied.
+	:param filename: The evt file.
+	:param output: The output directory, where the JSON is written to <locale>/<name>.json or <locale>/<name>-messages.json.
+	"""
+	with open(filename, 'rb') as f:
+		if os.fstat(f.fileno()).st_size == 0: return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			for (suffix, args) in find_events(data):
+				(name, lang, obj) = decode_event_arguments(args)
+				(output / Path(lang)).mkdir(parents=True, exist_ok=True)
+				with open(output / Path(lang) / Path(name+suffix+'.json'), 'w', encoding=ENCODING) as w:
+					w.write(json.dumps(obj, indent='\t'))
+
 def run_json_extract(args):
 	input = Path(args.input).resolve()
 	output = Path(args.output).resolve()
-	for filename in list(input.rglob('*_messages.evt')) + list(input.rglob('*_metadata.evt')):
-		with open(filename, encoding=ENCODING) as f:
-			for line in f:
-				suffix=None
-				if line.find(BLOCK_METADATA_EVENT) != -1: suffix=''
-				if line.find(BLOCK_MESSAGES_EVENT) != -1: suffix='-messages'
-				if suffix != None:
-					#Get all characters between first and last parenthesis
-					pattern = r'\((.*)\)'
-					jsonversion = '['+ re.search(pattern,line).group(1) + ']'
-					(name, lang, jsonstr) = json.loads(jsonversion)
-					(output / Path(lang)).mkdir(parents=True, exist_ok=True)
-					with open(output / Path(lang) / Path(name+suffix+'.json'), 'w', encoding=ENCODING) as w:
-						json.dump(json.loads(jsonstr), w, indent='\t')
+	files = list(input.rglob('*_messages.evt')) + list(input.rglob('*_metadata.evt'))
+	# a process pool takes longer to start than small files take to extract, so only start as many processes as have enough to extract
+	jobs = max(1, min(args.jobs, len(files), sum(f.stat().st_size for f in files) // MIN_BYTES_PER_JOB))
+	if jobs == 1:
+		for filename in files:
+			extract_evt_file(filename, output)
+		return
+	with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+		for future in [executor.submit(extract_evt_file, filename, output) for filename in files]:
+			future.result()
 
 def run_json_pack(args):
 	input = Path(args.input).resolve()
 	output = Path(args.output).resolve()
 	name = args.name
 	buildExtension.gen_messages_evt_file(name, input, output, {})
-	packed = False
+	events = []
 	for locale in LOCALES.split(','):
 		if os.path.exists(Path(input / (f'{locale}/'))):
-			if not packed:
-				# First time writing to evt file, clear existing contents, so that each locale can be appended.
-				packed = True
-				outFile = Path(output / 'events' / f'{name}_metadata.evt')
-				if os.path.exists(outFile):
-					os.remove(outFile)
 			metadata = Path(input / (f'{locale}/' + name + '.json')).read_text(encoding=ENCODING)
-			buildExtension.write_evt_file(output, f'{name}_metadata.evt', f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_METADATA_EVENT}("{name}", "{locale}", {buildExtension.embeddable_json_str(metadata)})')
-
-	if not packed:
+			events.append(f'"{BLOCK_REGISTRY_CHANNEL}",{BLOCK_METADATA_EVENT}("{name}", "{locale}", {buildExtension.embeddable_json_str(metadata)})')
+	if events:
+		buildExtension.write_evt_events(output, f'{name}_metadata.evt', events)
+	else:
 		print(f"Error during pack: Failed to find a directory with supported locales at '{input}/'. Supported locales: {LOCALES}", file=sys.stderr)
 
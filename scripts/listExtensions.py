@@ -13,6 +13,8 @@ def add_arguments(parser):
     remote.add_argument('--username',
                         help='the Cumulocity tenant identifier and the username in the <tenantId>/<username> format (can also be set via CUMULOCITY_USERNAME environment variable)')
     remote.add_argument('--password', help='the Cumulocity password (can also be set via CUMULOCITY_PASSWORD environment variable)')
+    remote.add_argument('--timeout', metavar='SECS', type=float, default=buildExtension.HTTP_TIMEOUT_SECS, required=False,
+                        help=f'the timeout in seconds of connecting to Cumulocity and of each read from it (default {buildExtension.HTTP_TIMEOUT_SECS})')
 
 def run(args):
     # Support remote operations and whether they are mandatory.
@@ -20,7 +22,7 @@ def run(args):
 
     # checks if all manadatory remote options are provided
     buildExtension.prepareRemoteOptions(args,remote)
-    connection = buildExtension.C8yConnection( args.cumulocity_url, args.username,args.password)
+    connection = buildExtension.C8yConnection( args.cumulocity_url, args.username,args.password, args.timeout)
     try:
         extension_mos = connection.do_get('/inventory/managedObjects', {'fragmentType': "pas_extension", "pageSize": 2000})
         for mo in extension_mos['managedObjects']: 
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026-present Cumulocity GmbH, Duesseldorf, Germany and/or its affiliates and/or their licensors.
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Cumulocity GmbH
+"""
+Upload of an extension zip to many tenants at once.
+
+The tenants are listed in a JSON file, with references to the environment variables holding their credentials so that
+the file itself can be checked in:
+
+	[
+		{"name": "prod-eu", "url": "https://prod-eu.example.com", "usernameEnv": "PROD_EU_USER", "passwordEnv": "PROD_EU_PASSWORD"},
+		{"url": "https://test.example.com", "username": "t1234/ci", "passwordEnv": "TEST_PASSWORD"}
+	]
+"""
+import concurrent.futures, contextlib, json, os, sys, threading, time, zipfile
+import buildExtension
+
+TENANT_KEYS = {'name', 'url', 'username', 'usernameEnv', 'passwordEnv'}
+RETRY_BACKOFF_SECS = 2 # Time before the first retry of a tenant, doubled for each further retry
+
+def add_arguments(parser):
+	""" Add parser arguments. """
+	parser.add_argument('--input', metavar='ZIP_FILE', type=str, required=True, help='the extension zip file to upload')
+	parser.add_argument('--name', type=str, required=False, help='the extension name in the inventory (default the base name of the zip file)')
+	parser.add_argument('--tenants', metavar='JSON_FILE', type=str, required=True, help='a JSON file listing the tenants, each with a "url", a "username" or "usernameEnv" and a "passwordEnv" naming the environment variables holding the credentials, and optionally a "name"')
+	parser.add_argument('--jobs', metavar='N', type=int, default=8, required=False, help='the maximum number of tenants to upload to concurrently (default 8)')
+	parser.add_argument('--retries', metavar='N', type=int, default=2, required=False, help='the number of times to retry the whole rollout to a tenant which failed with a connection failure or a server error, in addition to the retries of each request (default 2)')
+	parser.add_argument('--restart', action='store_true', default=False, help='restart the apama-ctrl of each tenant as soon as the extension is uploaded to it')
+	parser.add_argument('--restartWaves', metavar='N', type=int, required=False, help='once the extension is uploaded to all tenants, restart the apama-ctrl of the tenants it was uploaded to in N waves, in the order of the tenants file, stopping if a restart of a wave fails')
+	parser.add_argument('--waveInterval', metavar='SECS', type=float, default=60, required=False, help='the time to wait after each restart wave before starting the next one (default 60)')
+	parser.add_argument('--wait', action='store_true', default=False, help='after restarting the apama-ctrl of a tenant, wait until it is ready to use, a restart wave only being complete once all its tenants are ready')
+	parser.add_argument('--waitTimeout', metavar='SECS', type=float, default=buildExtension.RESTART_TIMEOUT_SECS, required=False, help=f'the maximum time to wait for the apama-ctrl of a tenant to be ready after restarting it (default {buildExtension.RESTART_TIMEOUT_SECS})')
+	parser.add_argument('--force', action='store_true', default=False, help='upload the extension, and restart the apama-ctrl, even to tenants which already have the same extension')
+	parser.add_argument('--ignoreVersion', action='store_true', default=False, required=False, help='ignore the analytics builder script version check')
+	parser.add_argument('--timeout', metavar='SECS', type=float, default=buildExtension.HTTP_TIMEOUT_SECS, required=False,
+						help=f'the timeout in seconds of connecting to Cumulocity and of each read from it (default {buildExtension.HTTP_TIMEOUT_SECS})')
+
+class Tenant(object):
+	"""
+	A tenant to roll the extension out to, with the outcome of the rollout.
+	"""
+	def __init__(self, name, url, username, password):
+		self.name = name
+		self.url = url
+		self.username = username
+		self.password = password
+		self.status = 'pending'
+		self.attempts = 0
+		self.seconds = 0.0
+		self.restart = ''
+		self.restartSeconds = None
+		self.downtime = None
+		self.readySeconds = None
+		self.error = None
+
+	def connect(self, timeout):
+		return buildExtension.C8yConnection(self.url, self.username, self.password, timeout)
+
+class TenantOutput(object):
+	"""
+	Stream prefixing each line written while working on a tenant with the name of the tenant, so that the output of
+	the tenants rolled out to concurrently can be told apart.
+	"""
+	def __init__(self, stream):
+		self.stream = stream
+		self.local = threading.local()
+		self.lock = threading.Lock()
+
+	def write(self, text):
+		tenant = getattr(self.local, 'tenant', None)
+		if tenant is None:
+			return self.stream.write(text)
+		# Only write whole lines, so that the lines of different tenants are not mixed up
+		(*lines, self.local.pending) = (self.local.pending + text).split('\n')
+		if lines:
+			with self.lock:
+				self.stream.write(''.join(f'{tenant.name}: {line}\n' for line in lines))
+				self.stream.flush()
+		return len(text)
+
+	def flush(self):
+		self.stream.flush()
+
+	def __getattr__(self, name):
+		return getattr(self.stream, name)
+
+@contextlib.contextmanager
+def tenant_output(tenant):
+	""" Prefix the output of the current thread with the name of a tenant, see TenantOutput. """
+	streams = [s for s in (sys.stdout, sys.stderr) if isinstance(s, TenantOutput)]
+	for s in streams:
+		(s.local.tenant, s.local.pending) = (tenant, '')
+	try:
+		yield
+	finally:
+		for s in streams:
+			if s.local.pending: s.write('\n')
+			s.local.tenant = None
+
+def read_tenants(path):
+	"""
+	Read the tenants to roll the extension out to.
+	:param path: The JSON file listing the tenants.
+	:return: List of Tenant objects, with the credentials taken from the environment.
+	"""
+	with open(path, encoding=buildExtension.ENCODING) as f:
+		entries = json.load(f)
+	if not isinstance(entries, list) or not entries:
+		raise Exception(f'The tenants file must contain a list of tenants: {path}')
+	tenants = []
+	for (i, entry) in enumerate(entries):
+		if not isinstance(entry, dict) or not entry.get('url'):
+			raise Exception(f'Tenant {i + 1} of the tenants file must have a "url": {path}')
+		unknown = set(entry) - TENANT_KEYS
+		if unknown:
+			raise Exception(f'Unknown keys for tenant {i + 1} of the tenants file: {", ".join(sorted(unknown))}')
+		def credential(key, envKey):
+			if entry.get(key): return entry[key]
+			if not entry.get(envKey):
+				raise Exception(f'Tenant {i + 1} of the tenants file must have a "{envKey}": {path}')
+			if not os.environ.get(entry[envKey]):
+				raise Exception(f'The environment variable {entry[envKey]} for the {key} of tenant {entry.get("name", entry["url"])} is not set')
+			return os.environ[entry[envKey]]
+		tenants.append(Tenant(entry.get('name') or entry['url'], entry['url'], credential('username', 'usernameEnv'), credential('password', 'passwordEnv')))
+	names = [t.name for t in tenants]
+	duplicates = sorted({n for n in names if names.count(n) > 1})
+	if duplicates:
+		raise Exception(f'The tenants file lists more than once: {", ".join(duplicates)}')
+	return tenants
+
+def with_retries(retries, action, attempts=None):
+	"""
+	Run an action, retrying it with an increasing delay after transient failures.
+	:param retries: The maximum number of retries.
+	:param action: Function to call.
+	:param attempts: Function called with the number of each attempt before it is made.
+	:return: The result of the action.
+	"""
+	for attempt in range(retries + 1):
+		if attempts: attempts(attempt + 1)
+		try:
+			return action()
+		except SystemExit:
+			# checkIfExtensionsSupported exits if the microservice does not support extensions
+			raise Exception('Extensions are not supported by the microservice variant of the tenant, ignore the check using --ignoreVersion')
+		except Exception as ex:
+			if attempt == retries or not buildExtension.is_transient_error(ex):
+				raise
+			time.sleep(RETRY_BACKOFF_SECS * 2 ** attempt)
+
+def rollout_to_tenant(tenant, args):
+	""" Upload the extension to a tenant, and restart its apama-ctrl if requested, recording the outcome on it. """
+	start = time.monotonic()
+	try:
+		with tenant.connect(args.timeout) as connection, tenant_output(tenant):
+			# Only the upload is retried, retrying a restart could request it twice
+			changed = with_retries(args.retries, lambda: buildExtension.upload_or_delete(connection, args.input, args.name,
+				False, False, args.ignoreVersion, printMsg=False, force=args.force), lambda n: setattr(tenant, 'attempts', n))
+			tenant.status = 'uploaded' if changed else 'unchanged'
+			if args.restart and changed:
+				restart_apama_ctrl(tenant, connection, args)
+	except Exception as ex:
+		tenant.status = 'FAILED'
+		tenant.error = str(ex)
+	tenant.seconds = time.monotonic() - start
+	print(f'{tenant.name}: {tenant.status} in {tenant.seconds:.1f}s' + (f', restart {tenant.restart}' if tenant.restart else '') +
+		(f': {tenant.error}' if tenant.error else ''), flush=True)
+
+def restart_apama_ctrl(tenant, connection, args):
+	"""
+	Request a restart of the apama-ctrl of a tenant, once, and wait for it to be ready if requested, recording the
+	outcome on the tenant.
+	"""
+	start = time.monotonic()
+	try:
+		buildExtension.restart_apama_ctrl(connection)
+		tenant.restart = 'requested'
+		if args.wait:
+			(tenant.downtime, tenant.readySeconds) = buildExtension.wait_for_apama_ctrl(connection, start, args.waitTimeout, name=args.name)
+			tenant.restart = 'ready'
+	except Exception as ex:
+		tenant.restart = 'FAILED'
+		tenant.error = str(ex)
+	tenant.restartSeconds = time.monotonic() - start
+
+def restart_tenant(tenant, args):
+	""" Restart the apama-ctrl of a tenant, recording the outcome on it. """
+	try:
+		with tenant.connect(args.timeout) as connection, tenant_output(tenant):
+			restart_apama_ctrl(tenant, connection, args)
+	except Exception as ex:
+		tenant.restart = 'FAILED'
+		tenant.error = str(ex)
+	print(f'{tenant.name}: restart {tenant.restart}' + (f' in {tenant.restartSeconds:.1f}s' if tenant.restartSeconds is not None else '') +
+		(f': {tenant.error}' if tenant.error else ''), flush=True)
+
+def restart_in_waves(tenants, args, executor):
+	"""
+	Restart the apama-ctrl of the tenants in waves, the tenants of a wave being restarted concurrently.
+	:return: None
+	"""
+	# The waves are consecutive runs of tenants in the order of the tenants file
+	size = -(-len(tenants) // args.restartWaves)
+	waves = [tenants[i:i + size] for i in range(0, len(tenants), size)]
+	for (n, wave) in enumerate(waves):
+		print(f'Restart wave {n + 1} of {len(waves)}: {", ".join(t.name for t in wave)}', flush=True)
+		list(executor.map(lambda t: restart_tenant(t, args), wave))
+		failed = [t for t in wave if t.restart == 'FAILED']
+		if failed:
+			for t in (t for w in waves[n + 1:] for t in w):
+				t.restart = 'skipped'
+			print(f'Not restarting the remaining tenants as the restart of {", ".join(t.name for t in failed)} failed', file=sys.stderr)
+			return
+		if n < len(waves) - 1:
+			time.sleep(args.waveInterval)
+
+def run(args):
+	if not os.path.exists(args.input) or not args.input.endswith('.zip'):
+		raise Exception(f'Provide a valid path to the .zip file.')
+	if not zipfile.is_zipfile(args.input):
+		raise Exception(f'{args.input} is not a valid .zip file.')
+	if args.restart and args.restartWaves:
+		raise Exception(f'Arguments --restart and --restartWaves cannot be used together.')
+	if args.restartWaves is not None and args.restartWaves < 1:
+		raise Exception(f'Argument --restartWaves must be at least 1.')
+	if args.wait and not (args.restart or args.restartWaves):
+		raise Exception(f'Argument --wait requires --restart or --restartWaves.')
+	args.name = args.name or os.path.splitext(os.path.basename(args.input))[0]
+	tenants = read_tenants(args.tenants)
+
+	start = time.monotonic()
+	(stdout, stderr) = (sys.stdout, sys.stderr)
+	(sys.stdout, sys.stderr) = (TenantOutput(stdout), TenantOutput(stderr))
+	try:
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(args.jobs, len(tenants)))) as executor:
+			list(executor.map(lambda t: rollout_to_tenant(t, args), tenants))
+			if args.restartWaves:
+				to_restart = [t for t in tenants if t.status == 'uploaded']
+				if to_restart:
+					restart_in_waves(to_restart, args, executor)
+	finally:
+		(sys.stdout, sys.stderr) = (stdout, stderr)
+
+	print('\nRollout summary:')
+	width = max(len('TENANT'), max(len(t.name) for t in tenants))
+	seconds = lambda s: f'{s:.1f}s' if s is not None else ''
+	print(f'  {"TENANT":<{width}}  {"STATUS":<9}  {"TRIES":>5}  {"UPLOAD TIME":>11}  {"RESTART":<9}  {"RESTART TIME":>12}' +
+		(f'  {"DOWNTIME":>8}  {"READY AFTER":>11}' if args.wait else ''))
+	for t in tenants:
+		print((f'  {t.name:<{width}}  {t.status:<9}  {t.attempts:>5}  {t.seconds:10.1f}s  {t.restart:<9}  {seconds(t.restartSeconds):>12}' +
+			(f'  {seconds(t.downtime):>8}  {seconds(t.readySeconds):>11}' if args.wait else '') + (f'  {t.error}' if t.error else '')).rstrip())
+	failures = [t for t in tenants if t.status == 'FAILED' or t.restart == 'FAILED']
+	print(f'Rolled out {args.name} to {len(tenants) - len(failures)} of {len(tenants)} tenants in {time.monotonic() - start:.1f}s')
+	if failures:
+		raise Exception(f'The rollout failed for {len(failures)} of {len(tenants)} tenants')
@@ -20,8 +20,16 @@ def add_arguments(parser):
     remote.add_argument('--delete', action='store_true', default=False, help='delete the extension from the inventory')
     remote.add_argument('--restart', action='store_true', default=False,
                         help='restart the apama-ctrl')
+    remote.add_argument('--force', action='store_true', default=False,
+                        help='upload the extension, and restart the apama-ctrl if requested, even if the same extension is already in the inventory')
+    remote.add_argument('--wait', action='store_true', default=False,
+                        help='after restarting the apama-ctrl, wait until it is ready to use, and report the time it took')
+    remote.add_argument('--waitTimeout', metavar='SECS', type=float, default=buildExtension.RESTART_TIMEOUT_SECS, required=False,
+                        help=f'the maximum time to wait for the apama-ctrl to be ready after restarting it (default {buildExtension.RESTART_TIMEOUT_SECS})')
     remote.add_argument('--ignoreVersion', action='store_true', default=False, required=False,
                         help='ignore the analytics builder script version check')
+    remote.add_argument('--timeout', metavar='SECS', type=float, default=buildExtension.HTTP_TIMEOUT_SECS, required=False,
+                        help=f'the timeout in seconds of connecting to Cumulocity and of each read from it (default {buildExtension.HTTP_TIMEOUT_SECS})')
 
 def run(args):
     # Support remote operations and whether they are mandatory.
@@ -30,6 +38,8 @@ def run(args):
 
     # checks if all manadatory remote options are provided
     buildExtension.prepareRemoteOptions(args,remote)
+    if args.wait and not args.restart:
+        raise Exception(f'Argument --wait requires --restart.')
     if args.input:
         if not os.path.exists(args.input):
             raise Exception(f'Provide a valid path to the .zip file.')
@@ -56,4 +66,6 @@ def run(args):
         if args.delete and not args.name:
             raise Exception(f'Arguments --input or --name is needed to delete an extension.')
     return buildExtension.upload_or_delete_extension(args.input, args.cumulocity_url, args.username, args.password, args.name,
-                                      args.delete, args.restart, args.ignoreVersion, printMsg=True)
+                                      args.delete, args.restart, args.ignoreVersion, printMsg=True,
+                                      timeout=args.timeout, force=args.force,
+                                      waitTimeout=args.waitTimeout if args.wait else None)